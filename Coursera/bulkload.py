@@ -0,0 +1,297 @@
+"""Bulk CSV loading into SQLite for the SQL notebooks.
+
+load_csv streams a CSV file or URL into a table without holding it all
+in memory: pandas parses it `chunk_rows` at a time and each chunk is
+inserted with executemany in its own transaction. The prepared INSERT
+takes ROWS_PER_STATEMENT rows at once; the rows are grouped with a NumPy
+reshape, so no per-row work happens in Python, and NaN binds as NULL.
+That costs about half of a one-row INSERT fed from itertuples.
+
+Column types are picked from the pandas dtypes as DataFrame.to_sql picks
+them, and widened (INTEGER to REAL to TEXT) when a later chunk needs it,
+e.g. an integer column with gaps further down. The rows already loaded
+are copied across, so a column that turns into text late keeps its
+earlier values as SQLite prints the numbers.
+
+The database is switched to WAL with synchronous=NORMAL, and indexes
+are built once, after the rows are in.
+
+    con = sqlite3.connect("socioeconomic.db")
+    load_csv(con, url, "chicago_socioeconomic_data", indexes=SOCIOECONOMIC_INDEXES)
+
+    python bulkload.py                           check against df.to_sql
+    python bulkload.py --bench [rows [repeat]]   rows/sec against to_sql, best of 3 at 10M rows
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 500000
+ROWS_PER_STATEMENT = 256
+
+SOCIOECONOMIC_INDEXES = ('hardship_index', 'per_capita_income_')
+SOCIOECONOMIC_COLUMNS = (
+    'ca', 'community_area_name', 'percent_of_housing_crowded',
+    'percent_households_below_poverty', 'percent_aged_16_unemployed',
+    'percent_aged_25_without_high_school_diploma',
+    'percent_aged_under_18_or_over_64', 'per_capita_income_', 'hardship_index',
+)
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+
+
+def quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+TYPES = ('INTEGER', 'REAL', 'TEXT')
+
+
+def column_type(dtype):
+    """SQLite type for a pandas dtype, as to_sql maps them."""
+    if dtype.kind in 'iub':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+
+def create_table(con, table, columns, types):
+    con.execute("CREATE TABLE %s (%s)" % (quote(table), ", ".join(
+        "%s %s" % (quote(name), kind) for name, kind in zip(columns, types))))
+
+
+def retype(con, table, columns, types):
+    """Recreate `table` with new column types, keeping its rows."""
+    old = table + "_retype"
+    con.execute("ALTER TABLE %s RENAME TO %s" % (quote(table), quote(old)))
+    create_table(con, table, columns, types)
+    names = ", ".join(map(quote, columns))
+    con.execute("INSERT INTO %s (%s) SELECT %s FROM %s" % (quote(table), names, names, quote(old)))
+    con.execute("DROP TABLE %s" % quote(old))
+
+
+def insert_statement(table, columns, rows=1):
+    """INSERT naming `columns`, so a CSV in another column order still lines up."""
+    row = "(%s)" % ", ".join(["?"] * len(columns))
+    return "INSERT INTO %s (%s) VALUES %s" % (
+        quote(table), ", ".join(map(quote, columns)), ", ".join([row] * rows))
+
+
+def statement_rows(con, columns):
+    """Rows per INSERT: ROWS_PER_STATEMENT, or fewer if they need too many variables."""
+    return max(1, min(ROWS_PER_STATEMENT, con.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) // columns))
+
+
+def insert_frame(con, table, df):
+    """executemany over one multi-row INSERT, then the rows left over."""
+    values = df.to_numpy(object)
+    columns = len(df.columns)
+    rows = statement_rows(con, columns)
+    full = len(values) // rows * rows
+    if full:
+        con.executemany(insert_statement(table, df.columns, rows), values[:full].reshape(-1, rows * columns).tolist())
+    con.executemany(insert_statement(table, df.columns), values[full:].tolist())
+
+
+def tune(con):
+    for pragma in PRAGMAS:
+        con.execute(pragma)
+
+
+def create_indexes(con, table, columns):
+    if not columns:
+        return
+    for column in columns:
+        con.execute("CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (
+            quote("ix_%s_%s" % (table, column)), quote(table), quote(column)))
+    con.execute("ANALYZE %s" % quote(table))
+    con.commit()
+
+
+def load_csv(con, source, table, if_exists='replace', indexes=(), chunk_rows=CHUNK_ROWS):
+    """Load a CSV with a header row into `table`. Returns the number of rows.
+
+    `source` is anything pandas.read_csv reads. `if_exists` is 'replace',
+    'append' or 'fail', as for DataFrame.to_sql. `indexes` names columns
+    to index once the rows are loaded.
+    """
+    tune(con)
+    exists = con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                         (table,)).fetchone() is not None
+    if exists and if_exists == 'fail':
+        raise ValueError("Table '%s' already exists." % table)
+
+    total = 0
+    types = None  # column types, if this load created the table
+    with pd.read_csv(source, chunksize=chunk_rows) as chunks:
+        for i, chunk in enumerate(chunks):
+            chunk_types = [column_type(dtype) for dtype in chunk.dtypes]
+            with con:
+                if i == 0:
+                    if exists and if_exists == 'replace':
+                        con.execute("DROP TABLE %s" % quote(table))
+                        exists = False
+                    if not exists:
+                        types = chunk_types
+                        create_table(con, table, chunk.columns, types)
+                elif types is not None:
+                    wider = [max(a, b, key=TYPES.index) for a, b in zip(types, chunk_types)]
+                    if wider != types:
+                        types = wider
+                        retype(con, table, chunk.columns, types)
+                insert_frame(con, table, chunk)
+            total += len(chunk)
+
+    create_indexes(con, table, indexes)
+    return total
+
+
+# ----------------- Check and benchmark -----------------
+def socioeconomic_frame(n, seed=0):
+    """n rows shaped like the Chicago socioeconomic data, with some gaps."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'ca': np.arange(1, n + 1, dtype=float),
+        'community_area_name': np.array(['Rogers Park', 'West Ridge', 'Uptown', 'Lincoln Square',
+                                         'North Center', 'Lake View'])[rng.integers(0, 6, n)],
+        'percent_of_housing_crowded': rng.integers(0, 160, n) / 10,
+        'percent_households_below_poverty': rng.integers(0, 600, n) / 10,
+        'percent_aged_16_unemployed': rng.integers(0, 400, n) / 10,
+        'percent_aged_25_without_high_school_diploma': rng.integers(0, 550, n) / 10,
+        'percent_aged_under_18_or_over_64': rng.integers(130, 520, n) / 10,
+        'per_capita_income_': rng.integers(8000, 90000, n),
+        'hardship_index': rng.integers(1, 99, n).astype(float),
+    }, columns=list(SOCIOECONOMIC_COLUMNS))
+    df.loc[rng.random(n) < 0.01, 'ca'] = np.nan
+    df.loc[rng.random(n) < 0.01, 'hardship_index'] = np.nan
+    return df
+
+
+def write_csv(path, n, chunk=1000000):
+    for i in range(0, n, chunk):
+        frame = socioeconomic_frame(min(chunk, n - i), seed=i)
+        frame['ca'] += i
+        frame.to_csv(path, mode='a' if i else 'w', header=not i, index=False)
+
+
+def check():
+    """Same rows as read_csv + to_sql, over several commits, and the indexes get used."""
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'data.csv')
+        write_csv(path, 25000)
+        table = 'chicago_socioeconomic_data'
+
+        old = sqlite3.connect(os.path.join(root, 'old.db'))
+        df = pd.read_csv(path)
+        df.to_sql(table, old, if_exists='replace', index=False, method='multi',
+                  chunksize=statement_rows(old, len(df.columns)))
+
+        con = sqlite3.connect(os.path.join(root, 'new.db'))
+        assert load_csv(con, path, table, indexes=SOCIOECONOMIC_INDEXES, chunk_rows=7000) == 25000
+        assert load_csv(con, path, table, indexes=SOCIOECONOMIC_INDEXES, chunk_rows=7000) == 25000
+
+        query = "SELECT * FROM %s ORDER BY rowid" % table
+        assert con.execute(query).fetchall() == old.execute(query).fetchall()
+        assert pd.read_sql(query, con).equals(pd.read_sql(query, old))
+        assert con.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        for column in SOCIOECONOMIC_INDEXES:
+            plan = con.execute("EXPLAIN QUERY PLAN SELECT * FROM %s WHERE %s > 50" % (table, column)).fetchall()
+            assert "USING INDEX" in plan[0][-1], plan
+
+        assert load_csv(con, path, table, if_exists='append') == 25000
+        assert con.execute("SELECT count(*) FROM %s" % table).fetchone()[0] == 50000
+        try:
+            load_csv(con, path, table, if_exists='fail')
+            raise AssertionError("loaded over an existing table")
+        except ValueError:
+            pass
+
+        # appending a CSV with the columns in another order
+        for db in (con, old):
+            db.execute("CREATE TABLE pairs (x INTEGER, y TEXT)")
+            db.execute("INSERT INTO pairs VALUES (1, 'a')")
+            db.commit()
+        swapped = pd.DataFrame({'y': ['b', 'c'], 'x': [2, 3]})
+        swapped.to_csv(path, index=False)
+        pd.read_csv(path).to_sql('pairs', old, if_exists='append', index=False)
+        assert load_csv(con, path, 'pairs', if_exists='append') == 2
+        query = "SELECT * FROM pairs ORDER BY rowid"
+        assert con.execute(query).fetchall() == old.execute(query).fetchall() == [(1, 'a'), (2, 'b'), (3, 'c')]
+
+        # columns whose type only shows after the first chunk
+        rows = np.arange(3000)
+        late = pd.DataFrame({'n': pd.array(np.where(rows == 2500, None, rows), dtype='Int64'),
+                             'note': np.where(rows >= 2900, 'revised', None)})
+        late.to_csv(path, index=False)
+        pd.read_csv(path).to_sql('late', old, index=False)
+        load_csv(con, path, 'late', chunk_rows=1000)
+        for db in (con, old):
+            assert [row[2] for row in db.execute("PRAGMA table_info(late)")] == ['REAL', 'TEXT']
+        query = "SELECT n, typeof(n), note, typeof(note) FROM late ORDER BY rowid"
+        assert con.execute(query).fetchall() == old.execute(query).fetchall()
+        con.close()
+        old.close()
+    finally:
+        shutil.rmtree(root)
+    print("ok")
+
+
+def bench(rows=10000000, repeat=3):
+    """Rows per second from a CSV on disk into a fresh database, each way.
+
+    The ways take turns `repeat` times and the best run of each is kept,
+    so a slow moment of the machine does not decide the comparison.
+    """
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'data.csv')
+        write_csv(path, rows)
+        print("%d rows, %.0f MB of CSV" % (rows, os.path.getsize(path) / 1e6))
+
+        def to_sql(con, method):
+            df = pd.read_csv(path)
+            # the notebook's multi call needs a chunksize past 3640 rows (too many SQL variables)
+            chunksize = con.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) // len(df.columns) if method else None
+            df.to_sql('data', con, index=False, method=method, chunksize=chunksize)
+
+        cases = (
+            ("to_sql multi", lambda con: to_sql(con, 'multi')),
+            ("to_sql", lambda con: to_sql(con, None)),
+            ("load_csv", lambda con: load_csv(con, path, 'data')),
+        )
+        best = dict.fromkeys([name for name, load in cases], (float('inf'), float('inf')))
+        for _ in range(repeat):
+            for name, load in cases:
+                db = os.path.join(root, 'bench.db')
+                con = sqlite3.connect(db)
+                start = time.perf_counter()
+                load(con)
+                loaded = time.perf_counter() - start
+                create_indexes(con, 'data', SOCIOECONOMIC_INDEXES)
+                indexed = time.perf_counter() - start - loaded
+                con.close()
+                os.remove(db)
+                best[name] = min(best[name][0], loaded), min(best[name][1], indexed)
+        for name, (loaded, indexed) in best.items():
+            print("%-14s load %8.2f s %12.0f rows/s   indexes %6.2f s" % (name, loaded, rows / loaded, indexed))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        bench(*map(int, sys.argv[sys.argv.index("--bench") + 1:][:2]))
+    else:
+        check()
@@ -0,0 +1,65 @@
+"""Struct-of-arrays storage for many small game entities.
+
+Each kind of entity (bullets, birds, ...) gets one EntityArrays, which
+keeps every field in its own contiguous NumPy array. Updates are whole
+array expressions, and culling builds an alive mask and compacts the
+survivors in one step, keeping them in spawn order.
+"""
+
+import numpy as np
+
+
+class EntityArrays(object):
+    """Live entities of one kind, one NumPy column per field.
+
+    pool['x'] is a view of the first len(pool) entries of the x column,
+    so `pool['x'] += 1` updates every entity in place.
+    """
+
+    def __init__(self, fields, dtype=np.float64, capacity=64):
+        self.fields = tuple(fields)
+        self.columns = {name: np.zeros(capacity, dtype) for name in self.fields}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self.columns[name][:self.count]
+
+    def __setitem__(self, name, values):
+        self.columns[name][:self.count] = values
+
+    def capacity(self):
+        return len(self.columns[self.fields[0]])
+
+    def _grow(self, needed):
+        size = max(needed, 2 * self.capacity())
+        for name, column in self.columns.items():
+            bigger = np.zeros(size, column.dtype)
+            bigger[:self.count] = column[:self.count]
+            self.columns[name] = bigger
+
+    def spawn(self, *values):
+        """Append one entity; `values` are given in field order."""
+        if self.count == self.capacity():
+            self._grow(self.count + 1)
+        for name, value in zip(self.fields, values):
+            self.columns[name][self.count] = value
+        self.count += 1
+
+    def keep(self, alive):
+        """Drop every entity whose entry in the boolean `alive` is False."""
+        n = int(np.count_nonzero(alive))
+        if n == self.count:
+            return
+        for column in self.columns.values():
+            column[:n] = column[:self.count][alive]
+        self.count = n
+
+    def clear(self):
+        self.count = 0
+
+    def rows(self):
+        """Entities as a list of plain-Python tuples, for drawing and hashing."""
+        return list(zip(*(self[name].tolist() for name in self.fields)))
@@ -0,0 +1,113 @@
+"""Many flappy-bird games stepped together with NumPy.
+
+FlappyBatch follows the same rules as FlappySim, but keeps N birds and
+their pipes in arrays and advances all of them with one step() call.
+A game that dies is reset straight away (there is no death screen), and
+step() reports it in `dones`.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from flappy_sim import (HEIGHT, WIDTH, BIRD_X, BIRD_SIZE, GRAVITY, FLAP_STRENGTH,
+                        PIPE_WIDTH, PIPE_GAP, PIPE_SPEED, PIPE_SPAWN_FRAMES, GROUND_HEIGHT)
+
+# pipes live (WIDTH + PIPE_WIDTH) / PIPE_SPEED frames and one spawns every
+# PIPE_SPAWN_FRAMES + 1, so this many slots per game is always enough
+MAX_PIPES = (WIDTH + PIPE_WIDTH) // PIPE_SPEED // (PIPE_SPAWN_FRAMES + 1) + 2
+
+
+class FlappyBatch(object):
+    """N independent flappy-bird games in struct-of-arrays form.
+
+    bird_y, bird_vel, score and spawn_timer have shape (N,); pipe_x,
+    pipe_gap and pipe_active have shape (N, MAX_PIPES). Pipe slots are
+    reused round-robin, which works because pipes leave in spawn order.
+    """
+
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.bird_y = np.empty(n)
+        self.bird_vel = np.empty(n)
+        self.score = np.zeros(n, np.int64)
+        self.spawn_timer = np.zeros(n, np.int64)
+        self.pipe_x = np.zeros((n, MAX_PIPES), np.int64)
+        self.pipe_gap = np.zeros((n, MAX_PIPES), np.int64)
+        self.pipe_active = np.zeros((n, MAX_PIPES), bool)
+        self.next_slot = np.zeros(n, np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        """Start over the games selected by the boolean `mask` (default all)."""
+        if mask is None:
+            mask = slice(None)
+        self.bird_y[mask] = HEIGHT // 2
+        self.bird_vel[mask] = 0
+        self.score[mask] = 0
+        self.pipe_active[mask] = False
+
+    def step(self, flaps):
+        """Advance every game one frame. Returns (rewards, dones)."""
+        # ----------------- Bird physics -----------------
+        self.bird_vel = np.where(flaps, FLAP_STRENGTH, self.bird_vel) + GRAVITY
+        self.bird_y += self.bird_vel
+
+        # ----------------- Pipe spawning -----------------
+        self.spawn_timer += 1
+        spawn = np.flatnonzero(self.spawn_timer > PIPE_SPAWN_FRAMES)
+        if len(spawn):
+            slot = self.next_slot[spawn]
+            self.spawn_timer[spawn] = 0
+            self.pipe_x[spawn, slot] = WIDTH
+            self.pipe_gap[spawn, slot] = self.rng.integers(100, HEIGHT - 200, len(spawn), endpoint=True)
+            self.pipe_active[spawn, slot] = True
+            self.next_slot[spawn] = (slot + 1) % MAX_PIPES
+
+        # Move pipes + scoring
+        pipe_x = self.pipe_x
+        pipe_x -= PIPE_SPEED
+        active = self.pipe_active
+        rewards = 10 * (active & (pipe_x + PIPE_WIDTH == BIRD_X)).sum(axis=1)
+        self.score += rewards
+
+        # Delete offscreen pipes
+        active &= pipe_x > -PIPE_WIDTH
+
+        # ----------------- Collisions -----------------
+        bird_y = self.bird_y
+        dones = (bird_y <= 0) | (bird_y >= HEIGHT - GROUND_HEIGHT)
+
+        # AABB against both pipes, with the bird's y truncated like pygame.Rect
+        top = bird_y.astype(np.int64)[:, None]
+        bottom = top + BIRD_SIZE
+        gap = self.pipe_gap
+        lower_start = gap + PIPE_GAP
+        lower_lo = np.minimum(lower_start, HEIGHT)
+        lower_hi = np.maximum(lower_start, HEIGHT)
+        hits = (active & (pipe_x < BIRD_X + BIRD_SIZE) & (BIRD_X < pipe_x + PIPE_WIDTH) &
+                (((top < gap) & (0 < bottom)) |
+                 ((lower_lo < lower_hi) & (top < lower_hi) & (lower_lo < bottom))))
+        dones |= hits.any(axis=1)
+
+        if dones.any():
+            self.reset(dones)
+        return rewards, dones
+
+
+def bench_steps(n=4096, steps=2000, seed=0):
+    """Env-steps per second for a batch of n games with random flaps."""
+    batch = FlappyBatch(n, seed)
+    rng = np.random.default_rng(seed + 1)
+    flaps = rng.random((steps, n)) < 0.06
+    start = time.perf_counter()
+    for i in range(steps):
+        batch.step(flaps[i])
+    elapsed = time.perf_counter() - start
+    print("%d games x %d steps in %.3f s: %.0f env-steps/s" % (n, steps, elapsed, n * steps / elapsed))
+
+
+if __name__ == "__main__":
+    bench_steps(*map(int, sys.argv[1:3]))
@@ -0,0 +1,126 @@
+"""Flappy-bird game state and physics, with no pygame or display needed.
+
+pokemon.py draws a FlappySim; anything else (agents, benchmarks) can
+step it directly as fast as the CPU allows.
+"""
+
+import random
+import sys
+import time
+
+WIDTH, HEIGHT = 400, 600
+
+# Bird settings
+BIRD_X = 80
+BIRD_SIZE = 30
+GRAVITY = 0.3
+FLAP_STRENGTH = -8
+
+# Pipes
+PIPE_WIDTH = 70
+PIPE_GAP = 250
+PIPE_SPEED = 3
+PIPE_SPAWN_FRAMES = 90
+
+GROUND_HEIGHT = 40
+DEATH_FRAMES = 90
+
+
+def overlaps(a0, a1, b0, b1):
+    """Half-open spans [a0, a1) and [b0, b1) intersect (b may be reversed)."""
+    if b1 < b0:
+        b0, b1 = b1, b0
+    return a0 < a1 and b0 < b1 and a0 < b1 and b0 < a1
+
+
+class FlappySim(object):
+    """One game of flappy bird, advanced a frame at a time by step().
+
+    Pipes are [x, gap_y] pairs: the top pipe covers 0..gap_y and the
+    bottom one gap_y + PIPE_GAP..HEIGHT, both PIPE_WIDTH wide.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.spawn_timer = 0
+        self.reset()
+
+    def reset(self):
+        self.bird_y = HEIGHT // 2
+        self.bird_vel = 0
+        self.pipes = []
+        self.score = 0
+        self.dead = False
+        self.death_timer = 0
+
+    def spawn_pipe(self):
+        gap_y = self.rng.randint(100, HEIGHT - 200)
+        return [WIDTH, gap_y]
+
+    def hits_pipe(self, pipe):
+        x, gap_y = pipe
+        # pygame.Rect truncates the bird's float position
+        top = int(self.bird_y)
+        if not overlaps(BIRD_X, BIRD_X + BIRD_SIZE, x, x + PIPE_WIDTH):
+            return False
+        return (overlaps(top, top + BIRD_SIZE, 0, gap_y) or
+                overlaps(top, top + BIRD_SIZE, gap_y + PIPE_GAP, HEIGHT))
+
+    def step(self, flap=False):
+        """Advance one frame. Returns True if the bird is dead afterwards."""
+        if self.dead:
+            # death screen: wait, then start over
+            self.death_timer += 1
+            if self.death_timer > DEATH_FRAMES:
+                self.reset()
+            return self.dead
+
+        if flap:
+            self.bird_vel = FLAP_STRENGTH
+
+        # ----------------- Bird physics -----------------
+        self.bird_vel += GRAVITY
+        self.bird_y += self.bird_vel
+
+        # ----------------- Pipe spawning -----------------
+        self.spawn_timer += 1
+        if self.spawn_timer > PIPE_SPAWN_FRAMES:
+            self.spawn_timer = 0
+            self.pipes.append(self.spawn_pipe())
+
+        # Move pipes + scoring
+        for p in self.pipes:
+            p[0] -= PIPE_SPEED
+
+            # Score when pipe passes bird
+            if p[0] + PIPE_WIDTH == BIRD_X:
+                self.score += 10
+
+        # Delete offscreen pipes
+        self.pipes = [p for p in self.pipes if p[0] > -PIPE_WIDTH]
+
+        # ----------------- Collisions -----------------
+        if self.bird_y <= 0 or self.bird_y >= HEIGHT - GROUND_HEIGHT:
+            self.dead = True
+
+        for p in self.pipes:
+            if self.hits_pipe(p):
+                self.dead = True
+
+        return self.dead
+
+
+def bench_steps(steps=200000, seed=0):
+    """Simulated steps per second with a random flapping policy."""
+    sim = FlappySim(seed)
+    policy = random.Random(seed + 1)
+    flaps = [policy.random() < 0.06 for _ in range(steps)]
+    start = time.perf_counter()
+    for flap in flaps:
+        sim.step(flap)
+    elapsed = time.perf_counter() - start
+    print("%d steps in %.3f s: %.0f steps/s" % (steps, elapsed, steps / elapsed))
+
+
+if __name__ == "__main__":
+    bench_steps(*map(int, sys.argv[1:2]))
@@ -0,0 +1,333 @@
+"""Record, replay and benchmark the four games, headless and repeatable.
+
+A recording is the seed plus every key event, tagged with the frame it
+arrived on. Replaying seeds `random` the same way and feeds the events
+back frame by frame, so the game takes exactly the same path. Replays
+and benchmarks run under the SDL dummy driver with no frame cap, and
+report p50/p99 update and draw times per frame.
+
+    python harness.py record tank tank.rec [seed]   play in a window, save the input
+    python harness.py replay tank.rec               replay it headless, print timings
+    python harness.py bench [game ...]              scripted input for every game
+    python harness.py check                         record and replay sessions ending in ESC
+
+File format: MAGIC, then (seed, name length) as '<IB' and the game
+name, then one '<IBI' (frame, kind, key) record per event, ending with
+an END record whose frame is the total frame count.
+"""
+
+import collections
+import importlib.util
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+if len(sys.argv) > 1 and sys.argv[1] in ("replay", "bench", "check"):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MAGIC = b'GREC1'
+HEADER = struct.Struct('<IB')
+EVENT = struct.Struct('<IBI')
+KEYDOWN, KEYUP, QUIT, END = 0, 1, 2, 255
+
+Recording = collections.namedtuple('Recording', 'game seed frames')
+
+
+# ----------------- Games -----------------
+def load(filename):
+    """Import a game script from this directory (the names have spaces)."""
+    name = os.path.splitext(filename)[0].replace(' ', '_')
+    if name not in sys.modules:
+        if HERE not in sys.path:
+            sys.path.insert(0, HERE)
+        spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+class HeldKeys(object):
+    """Stands in for pygame.key.get_pressed(), driven by the recorded events."""
+
+    def __init__(self):
+        self.down = set()
+
+    def __getitem__(self, key):
+        return key in self.down
+
+    def apply(self, events):
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                self.down.add(event.key)
+            elif event.type == pygame.KEYUP:
+                self.down.discard(event.key)
+
+
+class Flappy(object):
+    keys = ('K_SPACE',)
+    quit_keys = ('K_ESCAPE',)
+
+    def __init__(self, seed):
+        self.module = load('pokemon.py')
+        self.surface = pygame.display.set_mode((self.module.WIDTH, self.module.HEIGHT))
+        self.game = self.module.FlappySim(seed)
+        self.flap = False
+        self.was_dead = False
+        self.fps = 60
+
+    def input(self, events, keys):
+        self.flap = self.module.flapped(events)
+
+    def update(self):
+        self.was_dead = self.game.dead
+        self.game.step(self.flap)
+
+    def draw(self):
+        self.module.draw_frame(self.surface, self.game, self.was_dead)
+        pygame.display.update()
+
+
+class Snake(object):
+    keys = ('K_UP', 'K_DOWN', 'K_LEFT', 'K_RIGHT', 'K_r')
+    quit_keys = ('K_ESCAPE',)
+
+    def __init__(self, seed):
+        self.game = load('snake game.py').SnakeGame()
+
+    @property
+    def fps(self):
+        return self.game.fps
+
+    def input(self, events, keys):
+        self.game.handle_input(events)
+
+    def update(self):
+        self.game.update()
+
+    def draw(self):
+        self.game.draw()
+
+
+class Tank(object):
+    keys = ('K_LEFT', 'K_RIGHT', 'K_UP', 'K_DOWN', 'K_SPACE')
+    quit_keys = ()
+
+    def __init__(self, seed):
+        self.game = load('tank game.py').TankGame()
+        self.keys_held = None
+        self.fps = 60
+
+    def input(self, events, keys):
+        self.game.handle_input(events)
+        self.keys_held = keys
+
+    def update(self):
+        self.game.update(self.keys_held)
+
+    def draw(self):
+        self.game.draw()
+
+
+class Tomtest(object):
+    keys = ('K_UP', 'K_DOWN', 'K_LEFT', 'K_RIGHT', 'K_SPACE')
+    quit_keys = ()
+
+    def __init__(self, seed):
+        module = load('tomtest.py')
+        module.screen = pygame.display.set_mode((module.WIDTH, module.HEIGHT))
+        self.game = module.TomGame()
+        self.fps = 10
+
+    def input(self, events, keys):
+        self.game.handle_input(events)
+
+    def update(self):
+        self.game.update()
+
+    def draw(self):
+        self.game.draw()
+
+
+GAMES = {'flappy': Flappy, 'snake': Snake, 'tank': Tank, 'tomtest': Tomtest}
+
+
+def start(game, seed):
+    random.seed(seed)
+    return GAMES[game](seed)
+
+
+# ----------------- Recordings -----------------
+def save(recording, path):
+    name = recording.game.encode()
+    with open(path, 'wb') as f:
+        f.write(MAGIC + HEADER.pack(recording.seed, len(name)) + name)
+        for frame, events in enumerate(recording.frames):
+            f.write(b''.join(EVENT.pack(frame, kind, key) for kind, key in events))
+        f.write(EVENT.pack(len(recording.frames), END, 0))
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError("%s is not a game recording" % path)
+    pos = len(MAGIC)
+    seed, size = HEADER.unpack_from(data, pos)
+    pos += HEADER.size
+    game = data[pos:pos + size].decode()
+    frames = []
+    for frame, kind, key in EVENT.iter_unpack(data[pos + size:]):
+        if kind == END:
+            frames.extend([] for _ in range(frame - len(frames)))
+            break
+        frames.extend([] for _ in range(frame + 1 - len(frames)))
+        frames[frame].append((kind, key))
+    return Recording(game, seed, frames)
+
+
+def to_events(events):
+    """Recorded (kind, key) pairs as pygame events."""
+    types = {KEYDOWN: pygame.KEYDOWN, KEYUP: pygame.KEYUP}
+    return [pygame.event.Event(types[kind], key=key) for kind, key in events if kind in types]
+
+
+def scripted(game, frames, seed=0):
+    """A made-up but repeatable session: random taps and holds of the game's keys."""
+    rng = random.Random(seed)
+    keys = [getattr(pygame, name) for name in GAMES[game].keys]
+    script = [[] for _ in range(frames)]
+    for frame in range(frames):
+        if rng.random() < 0.1:
+            key = rng.choice(keys)
+            script[frame].append((KEYDOWN, key))
+            script[min(frame + rng.randint(1, 30), frames - 1)].append((KEYUP, key))
+    return Recording(game, seed, script)
+
+
+# ----------------- Running -----------------
+def record(game, path, seed=0):
+    """Play `game` in a window and save the seed and every key event to `path`."""
+    runner = start(game, seed)
+    clock = pygame.time.Clock()
+    held = HeldKeys()
+    kinds = {pygame.KEYDOWN: KEYDOWN, pygame.KEYUP: KEYUP, pygame.QUIT: QUIT}
+    frames = []
+    try:
+        while True:
+            clock.tick(runner.fps)
+            events = [e for e in pygame.event.get() if e.type in kinds]
+            frames.append([(kinds[e.type], getattr(e, 'key', 0)) for e in events])
+            held.apply(events)
+            runner.input(events, held)
+            runner.update()
+            runner.draw()
+    finally:
+        save(Recording(game, seed, frames), path)
+
+
+def replay(recording):
+    """Run a recording uncapped. Returns per-frame (update, draw) seconds.
+
+    Input handling counts towards update. A QUIT, or a press of a key
+    the game quits on, ends the replay before the frame it arrives on.
+    """
+    runner = start(recording.game, recording.seed)
+    quit_keys = {getattr(pygame, name) for name in runner.quit_keys}
+    held = HeldKeys()
+    update_times = []
+    draw_times = []
+    for events in recording.frames:
+        if any(kind == QUIT or (kind == KEYDOWN and key in quit_keys) for kind, key in events):
+            break
+        events = to_events(events)
+        start_time = time.perf_counter()
+        held.apply(events)
+        runner.input(events, held)
+        runner.update()
+        mid = time.perf_counter()
+        runner.draw()
+        update_times.append(mid - start_time)
+        draw_times.append(time.perf_counter() - mid)
+    return update_times, draw_times
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(name, update_times, draw_times):
+    print("%-8s %7d %10.3f %10.3f %10.3f %10.3f" % (
+        name, len(update_times),
+        percentile(update_times, 0.5) * 1000, percentile(update_times, 0.99) * 1000,
+        percentile(draw_times, 0.5) * 1000, percentile(draw_times, 0.99) * 1000))
+
+
+def print_header():
+    print("%-8s %7s %10s %10s %10s %10s" % ("game", "frames", "upd p50", "upd p99", "draw p50", "draw p99"))
+
+
+def bench(games=None, frames=3000, seed=0):
+    """Replay scripted sessions of every game; times are ms per frame."""
+    print_header()
+    for game in games or GAMES:
+        report(game, *replay(scripted(game, frames, seed)))
+
+
+def check(quit_after_ms=1000):
+    """Record each ESC-quitting game until a timed ESC press, then replay it."""
+    for game, runner in GAMES.items():
+        if not runner.quit_keys:
+            continue
+        pygame.init()
+        fd, path = tempfile.mkstemp(suffix='.rec')
+        os.close(fd)
+        try:
+            pygame.time.set_timer(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE),
+                                  quit_after_ms, loops=1)
+            try:
+                record(game, path)
+                raise AssertionError("%s did not quit on ESC" % game)
+            except SystemExit:
+                pass
+            recording = read(path)
+            assert (KEYDOWN, pygame.K_ESCAPE) in recording.frames[-1], game
+            pygame.init()
+            update_times, draw_times = replay(recording)
+            assert len(update_times) == len(recording.frames) - 1 > 0, game
+        finally:
+            os.remove(path)
+    pygame.quit()
+    print("ok")
+
+
+def usage():
+    print(__doc__.split("\n\n")[2])
+    sys.exit(2)
+
+
+if __name__ == "__main__":
+    pygame.init()
+    command, args = (sys.argv + [None])[1], sys.argv[2:]
+    if command == "record" and len(args) in (2, 3) and args[0] in GAMES:
+        record(args[0], args[1], int(args[2]) if len(args) == 3 else 0)
+    elif command == "replay" and len(args) == 1:
+        recording = read(args[0])
+        print_header()
+        report(recording.game, *replay(recording))
+    elif command == "bench" and all(game in GAMES for game in args):
+        bench(args)
+    elif command == "check" and not args:
+        check()
+    else:
+        usage()
@@ -0,0 +1,106 @@
+"""Grid occupancy with O(1) lookups and O(1) uniform free-cell sampling.
+
+Cells are numbered y * width + x. The free cells are kept in a list
+together with each cell's position in that list, so a cell can be taken
+out by swapping it with the last free cell and popping.
+"""
+
+import random
+import time
+from collections import deque
+
+EMPTY = 0
+SNAKE = 1
+FOOD = 2
+
+
+class OccupancyGrid(object):
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+        self.free = list(range(width * height))
+        self.slot = list(range(width * height))
+
+    def index(self, pos):
+        x, y = pos
+        return y * self.width + x
+
+    def pos(self, cell):
+        return cell % self.width, cell // self.width
+
+    def get(self, pos):
+        return self.cells[self.index(pos)]
+
+    def set(self, pos, state):
+        cell = self.index(pos)
+        old = self.cells[cell]
+        if old == state:
+            return
+        self.cells[cell] = state
+        if old == EMPTY:
+            self._take(cell)
+        elif state == EMPTY:
+            self._give(cell)
+
+    def _take(self, cell):
+        free, slot = self.free, self.slot
+        i = slot[cell]
+        last = free.pop()
+        if last != cell:
+            free[i] = last
+            slot[last] = i
+
+    def _give(self, cell):
+        self.slot[cell] = len(self.free)
+        self.free.append(cell)
+
+    def free_count(self):
+        return len(self.free)
+
+    def sample_free(self, rng=random):
+        """A uniformly random empty cell as (x, y), or None if the grid is full."""
+        if not self.free:
+            return None
+        return self.pos(self.free[rng.randrange(len(self.free))])
+
+
+def bench(sizes=(30, 100, 300, 1000), ticks=20000, seed=0):
+    """Tick cost of moving a snake and spawning food, grid vs set rebuild.
+
+    The snake fills a tenth of the grid; every tick it grows a head,
+    drops its tail and a food item is spawned and eaten. The old
+    rebuild-a-set approach is only timed on the smaller grids.
+    """
+    rng = random.Random(seed)
+    print("%10s %10s %14s %14s" % ("grid", "snake", "grid us/tick", "set us/tick"))
+    for size in sizes:
+        grid = OccupancyGrid(size, size)
+        snake = deque((i % size, i // size) for i in range(size * size // 10))
+        for pos in snake:
+            grid.set(pos, SNAKE)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            head = grid.sample_free(rng)
+            grid.set(head, SNAKE)
+            snake.appendleft(head)
+            grid.set(snake.pop(), EMPTY)
+            food = grid.sample_free(rng)
+            grid.set(food, FOOD)
+            grid.set(food, EMPTY)
+        fast = (time.perf_counter() - start) / ticks * 1e6
+
+        slow = '-'
+        if size <= 300:
+            rounds = 20
+            start = time.perf_counter()
+            for _ in range(rounds):
+                empty = list({(x, y) for x in range(size) for y in range(size)} - set(snake))
+                rng.choice(empty)
+            slow = "%.1f" % ((time.perf_counter() - start) / rounds * 1e6)
+        print("%10s %10d %14.2f %14s" % ("%dx%d" % (size, size), len(snake), fast, slow))
+
+
+if __name__ == "__main__":
+    bench()
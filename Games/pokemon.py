@@ -1,62 +1,57 @@
-import pygame
+import functools
+import os
 import sys
 import random
+import time
+
+import numpy as np
+
+if "--bench" in sys.argv:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from flappy_sim import (FlappySim, WIDTH, HEIGHT, BIRD_X, PIPE_WIDTH, PIPE_GAP,
+                        GROUND_HEIGHT)
+from profiler import from_argv
+from textcache import render_text
 
 # ----------------- Setup -----------------
 pygame.init()
-WIDTH, HEIGHT = 400, 600
 WIN = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Cartoon Flappy Bird")
 
 CLOCK = pygame.time.Clock()
 FONT = pygame.font.SysFont("Arial", 32, bold=True)
 BIG_FONT = pygame.font.SysFont("Comic Sans MS", 60, bold=True)
-
-# Bird settings
-bird_x = 80
-bird_y = HEIGHT // 2
-bird_vel = 0
-gravity = 0.3
-flap_strength = -8
-
-# Pipes
-pipe_width = 70
-pipe_gap = 250
-pipe_speed = 3
-pipes = []
-spawn_timer = 0
-
-score = 0
-dead = False
-death_timer = 0
+DEATH_TEXT = BIG_FONT.render("AGNES BAD", True, (255, 255, 255))
 
 # Colors
 SKY_TOP = (135, 206, 250)
 SKY_BOTTOM = (180, 230, 255)
+DEATH_TOP = (255, 120, 120)
+DEATH_BOTTOM = (255, 80, 80)
 PIPE_GREEN = (50, 220, 90)
 PIPE_OUTLINE = (0, 140, 40)
 GROUND_COLOR = (240, 200, 90)
 
 
-def reset_game():
-    global bird_y, bird_vel, pipes, score, dead, death_timer
-    bird_y = HEIGHT // 2
-    bird_vel = 0
-    pipes.clear()
-    score = 0
-    dead = False
-    death_timer = 0
+@functools.lru_cache(maxsize=8)
+def gradient_surface(color_top, color_bottom, size):
+    """Cartoon sky gradient, rendered once per colors and window size."""
+    width, height = size
+    ratio = (np.arange(height) / height)[:, None]
+    rows = (np.array(color_top) * (1 - ratio) + np.array(color_bottom) * ratio).astype(np.uint8)
+    pixels = np.repeat(rows[None, :, :], width, axis=0)
+    return pygame.surfarray.make_surface(pixels).convert()
 
 
-def spawn_pipe():
-    gap_y = random.randint(100, HEIGHT - 200)
-    top_rect = pygame.Rect(WIDTH, 0, pipe_width, gap_y)
-    bottom_rect = pygame.Rect(WIDTH, gap_y + pipe_gap, pipe_width, HEIGHT - (gap_y + pipe_gap))
-    return (top_rect, bottom_rect)
+def draw_gradient(surface, color_top, color_bottom):
+    surface.blit(gradient_surface(color_top, color_bottom, surface.get_size()), (0, 0))
 
 
-def draw_gradient(surface, color_top, color_bottom):
-    """Cartoon sky gradient."""
+def draw_gradient_lines(surface, color_top, color_bottom):
+    """The old per-row gradient, kept for the benchmark."""
     for i in range(HEIGHT):
         ratio = i / HEIGHT
         r = int(color_top[0] * (1 - ratio) + color_bottom[0] * ratio)
@@ -65,101 +60,138 @@ def draw_gradient(surface, color_top, color_bottom):
         pygame.draw.line(surface, (r, g, b), (0, i), (WIDTH, i))
 
 
-# ----------------- Main Loop -----------------
-while True:
-    CLOCK.tick(60)
+def pipe_rects(pipe):
+    x, gap_y = pipe
+    top_rect = pygame.Rect(x, 0, PIPE_WIDTH, gap_y)
+    bottom_rect = pygame.Rect(x, gap_y + PIPE_GAP, PIPE_WIDTH, HEIGHT - (gap_y + PIPE_GAP))
+    return top_rect, bottom_rect
 
-    for event in pygame.event.get():
+
+def flapped(events):
+    """True if SPACE was pressed; QUIT and ESC leave the game."""
+    flap = False
+    for event in events:
         if event.type == pygame.QUIT:
             pygame.quit()
             sys.exit()
         if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE and not dead:
-                bird_vel = flap_strength
+            if event.key == pygame.K_SPACE:
+                flap = True
             if event.key == pygame.K_ESCAPE:
                 pygame.quit()
                 sys.exit()
+    return flap
 
-    # ----------------- Death Screen -----------------
-    if dead:
-        death_timer += 1
-        draw_gradient(WIN, (255, 120, 120), (255, 80, 80))
-
-        text = BIG_FONT.render("AGNES BAD", True, (255, 255, 255))
-        WIN.blit(text, (WIDTH // 2 - text.get_width() // 2,
-                        HEIGHT // 2 - text.get_height() // 2))
-
-        pygame.display.update()
-
-        if death_timer > 90:
-            reset_game()
 
-        continue
+# ----------------- Rendering -----------------
+def draw_death_screen(surface):
+    draw_gradient(surface, DEATH_TOP, DEATH_BOTTOM)
 
-    # ----------------- Bird physics -----------------
-    bird_vel += gravity
-    bird_y += bird_vel
-
-    # ----------------- Pipe spawning -----------------
-    spawn_timer += 1
-    if spawn_timer > 90:
-        spawn_timer = 0
-        pipes.append(spawn_pipe())
-
-    # Move pipes + scoring
-    for p in pipes:
-        p[0].x -= pipe_speed
-        p[1].x -= pipe_speed
-
-        # Score when pipe passes bird
-        if p[0].x + pipe_width == bird_x:
-            score += 10
-
-    # Delete offscreen pipes
-    pipes = [p for p in pipes if p[0].x > -pipe_width]
-
-    # Collision rectangles
-    bird_rect = pygame.Rect(bird_x, bird_y, 30, 30)
-
-    # ----------------- Collisions -----------------
-    if bird_y <= 0 or bird_y >= HEIGHT - 40:
-        dead = True
+    text = DEATH_TEXT
+    surface.blit(text, (WIDTH // 2 - text.get_width() // 2,
+                        HEIGHT // 2 - text.get_height() // 2))
 
-    for top, bottom in pipes:
-        if bird_rect.colliderect(top) or bird_rect.colliderect(bottom):
-            dead = True
 
-    # ----------------- Draw everything -----------------
-    draw_gradient(WIN, SKY_TOP, SKY_BOTTOM)
+def draw_scene(surface, game):
+    draw_gradient(surface, SKY_TOP, SKY_BOTTOM)
 
     # Ground
-    pygame.draw.rect(WIN, GROUND_COLOR, (0, HEIGHT - 40, WIDTH, 40))
+    pygame.draw.rect(surface, GROUND_COLOR, (0, HEIGHT - GROUND_HEIGHT, WIDTH, GROUND_HEIGHT))
 
     # Cartoon Bird: body + eye + outline
-    pygame.draw.circle(WIN, (255, 255, 0), (bird_x + 15, int(bird_y + 15)), 15)
-    pygame.draw.circle(WIN, (0, 0, 0), (bird_x + 15, int(bird_y + 15)), 15, 3)
+    bird_x, bird_y = BIRD_X, game.bird_y
+    pygame.draw.circle(surface, (255, 255, 0), (bird_x + 15, int(bird_y + 15)), 15)
+    pygame.draw.circle(surface, (0, 0, 0), (bird_x + 15, int(bird_y + 15)), 15, 3)
 
     # Eye
-    pygame.draw.circle(WIN, (255, 255, 255), (bird_x + 22, int(bird_y + 10)), 6)
-    pygame.draw.circle(WIN, (0, 0, 0), (bird_x + 23, int(bird_y + 10)), 3)
+    pygame.draw.circle(surface, (255, 255, 255), (bird_x + 22, int(bird_y + 10)), 6)
+    pygame.draw.circle(surface, (0, 0, 0), (bird_x + 23, int(bird_y + 10)), 3)
 
     # Beak
-    pygame.draw.polygon(WIN, (255, 150, 0), [
+    pygame.draw.polygon(surface, (255, 150, 0), [
         (bird_x + 30, bird_y + 18),
         (bird_x + 45, bird_y + 20),
         (bird_x + 30, bird_y + 25),
     ])
 
     # Draw pipes (cartoon style)
-    for top, bottom in pipes:
-        pygame.draw.rect(WIN, PIPE_GREEN, top)
-        pygame.draw.rect(WIN, PIPE_GREEN, bottom)
-        pygame.draw.rect(WIN, PIPE_OUTLINE, top, 4)
-        pygame.draw.rect(WIN, PIPE_OUTLINE, bottom, 4)
+    for pipe in game.pipes:
+        top, bottom = pipe_rects(pipe)
+        pygame.draw.rect(surface, PIPE_GREEN, top)
+        pygame.draw.rect(surface, PIPE_GREEN, bottom)
+        pygame.draw.rect(surface, PIPE_OUTLINE, top, 4)
+        pygame.draw.rect(surface, PIPE_OUTLINE, bottom, 4)
 
     # Score (cartoon text)
-    score_text = FONT.render(str(score), True, (0, 0, 0))
-    WIN.blit(score_text, (WIDTH // 2 - score_text.get_width() // 2, 20))
+    score_text = render_text(FONT, str(game.score), True, (0, 0, 0))
+    surface.blit(score_text, (WIDTH // 2 - score_text.get_width() // 2, 20))
+
+
+def draw_frame(surface, game, was_dead):
+    if was_dead:
+        draw_death_screen(surface)
+    else:
+        draw_scene(surface, game)
+
+
+# ----------------- Benchmarks -----------------
+def bench_frame(frames=600):
+    """Per-frame cost of the sky and death backgrounds, headless."""
+    for name, draw in (("lines", draw_gradient_lines), ("cached", draw_gradient)):
+        start = time.perf_counter()
+        for i in range(frames):
+            if i % 2:
+                draw(WIN, SKY_TOP, SKY_BOTTOM)
+            else:
+                draw(WIN, DEATH_TOP, DEATH_BOTTOM)
+            pygame.display.update()
+        elapsed = time.perf_counter() - start
+        print("%-8s %8.3f ms/frame" % (name, elapsed / frames * 1000))
+
+
+def bench_render(steps=5000, seed=0):
+    """Steps per second with the rendering layer attached, uncapped."""
+    game = FlappySim(seed)
+    policy = random.Random(seed + 1)
+    start = time.perf_counter()
+    for _ in range(steps):
+        was_dead = game.dead
+        game.step(policy.random() < 0.06)
+        draw_frame(WIN, game, was_dead)
+        pygame.display.update()
+    elapsed = time.perf_counter() - start
+    print("rendered %d steps in %.3f s: %.0f steps/s" % (steps, elapsed, steps / elapsed))
+
+
+# ----------------- Main Loop -----------------
+def main():
+    game = FlappySim()
+    profiler = from_argv()
+
+    while True:
+        CLOCK.tick(60)
+        profiler.start()
+
+        flap = flapped(pygame.event.get())
+        profiler.mark('input')
+
+        # the frame that kills the bird still shows the scene
+        was_dead = game.dead
+        game.step(flap)
+        profiler.mark('update')
+        draw_frame(WIN, game, was_dead)
+        profiler.mark('draw')
+
+        # Update screen
+        pygame.display.update()
+        profiler.mark('present')
+        profiler.end(WIN)
+
 
-    # Update screen
-    pygame.display.update()
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        bench_frame()
+        bench_render()
+        pygame.quit()
+    else:
+        main()
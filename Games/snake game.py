@@ -1,9 +1,20 @@
 # Updated Snake game with multiple food colors and special red food death explosion
 # (Full rewritten version based on user's original code)
 
-import pygame
+import os
 import random
 import sys
+import time
+from collections import deque
+
+if "--bench" in sys.argv:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from occupancy import OccupancyGrid, EMPTY, SNAKE, FOOD
+from profiler import DISABLED, from_argv
+from textcache import render_text
 
 # --------- Configuration ----------
 CELL_SIZE = 20
@@ -41,39 +52,53 @@ def clamp(val, minv, maxv):
 
 
 class SnakeGame:
-    def __init__(self):
+    def __init__(self, dirty_rects=True, profiler=DISABLED):
         pygame.init()
         pygame.display.set_caption("Snake - Multi Food")
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont(None, 28)
         self.large_font = pygame.font.SysFont(None, 56)
+        self.pawsome_text = self.large_font.render("pawsome", True, WHITE)
+        self.restart_text = self.font.render("Press R to restart", True, WHITE)
+
+        # with dirty_rects only the cells that changed are redrawn and pushed
+        self.dirty_rects = dirty_rects
+        self.background = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)).convert()
+        self.background.fill(BLACK)
+        self.draw_grid(self.background)
+        self.dirty = set()
+        self.score_rect = pygame.Rect(8, 8, 0, 0)
+        self.profiler = profiler
         self.reset()
 
     def reset(self):
         start_x = GRID_WIDTH // 2
         start_y = GRID_HEIGHT // 2
-        self.snake = [(start_x - i, start_y) for i in range(3)]
+        self.snake = deque((start_x - i, start_y) for i in range(3))
+        # what is in each cell, kept in step with self.snake and self.food
+        self.grid = OccupancyGrid(GRID_WIDTH, GRID_HEIGHT)
+        for pos in self.snake:
+            self.grid.set(pos, SNAKE)
         self.direction = RIGHT
         self.next_direction = RIGHT
         self.score = 0
         self.fps = FPS
-        self.food_items = []
+        self.food = {}  # pos -> color
         self.spawn_multiple_food()
         self.game_over = False
         self.death_explosion = []
+        self.full_redraw = True
 
     def spawn_multiple_food(self):
-        self.food_items.clear()
-        empty = list({(x, y) for x in range(GRID_WIDTH) for y in range(GRID_HEIGHT)} - set(self.snake))
-        random.shuffle(empty)
+        for pos in self.food:
+            self.grid.set(pos, EMPTY)
+        self.food.clear()
         for i in range(NUM_FOOD):
-            pos = empty[i]
-            color = random.choice(FOOD_COLORS)
-            self.food_items.append((pos, color))
+            self.spawn_new_food()
 
-    def handle_input(self):
-        for event in pygame.event.get():
+    def handle_input(self, events):
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit(); sys.exit()
 
@@ -109,54 +134,91 @@ class SnakeGame:
             self.trigger_explosion()
             return
 
-        if new_head in self.snake:
+        # the tail has not moved yet, so running into it is fatal too
+        if self.grid.get(new_head) == SNAKE:
             self.trigger_explosion()
             return
 
-        self.snake.insert(0, new_head)
-
-        ate = None
-        for (pos, color) in self.food_items:
-            if pos == new_head:
-                ate = (pos, color)
-                break
+        ate = self.food.get(new_head)
+        # the old head changes color and the new one appears
+        self.dirty.add(self.snake[0])
+        self.dirty.add(new_head)
+        self.snake.appendleft(new_head)
+        self.grid.set(new_head, SNAKE)
 
         if ate:
-            pos, color = ate
-            if color == RED:
+            if ate == RED:
                 self.trigger_explosion()
                 return
             else:
                 self.score += 1
                 self.fps = clamp(self.fps + SPEED_INCREMENT, FPS, MAX_FPS)
-                self.food_items.remove(ate)
+                del self.food[new_head]
                 self.spawn_new_food()
         else:
-            self.snake.pop()
+            tail = self.snake.pop()
+            self.grid.set(tail, EMPTY)
+            self.dirty.add(tail)
 
     def spawn_new_food(self):
-        empty = list({(x, y) for x in range(GRID_WIDTH) for y in range(GRID_HEIGHT)} - set(self.snake) - {p for p, c in self.food_items})
-        if empty:
-            pos = random.choice(empty)
+        pos = self.grid.sample_free()
+        if pos is not None:
             color = random.choice(FOOD_COLORS)
-            self.food_items.append((pos, color))
+            self.grid.set(pos, FOOD)
+            self.food[pos] = color
+            self.dirty.add(pos)
 
     def trigger_explosion(self):
         self.game_over = True
-        self.death_explosion = [(pos, color) for (pos, color) in self.food_items]
+        self.death_explosion = list(self.food.items())
 
-    def draw_grid(self):
+    def draw_grid(self, surface):
         for x in range(0, WINDOW_WIDTH, CELL_SIZE):
-            pygame.draw.line(self.screen, DARK_GRAY, (x, 0), (x, WINDOW_HEIGHT))
+            pygame.draw.line(surface, DARK_GRAY, (x, 0), (x, WINDOW_HEIGHT))
         for y in range(0, WINDOW_HEIGHT, CELL_SIZE):
-            pygame.draw.line(self.screen, DARK_GRAY, (0, y), (WINDOW_WIDTH, y))
+            pygame.draw.line(surface, DARK_GRAY, (0, y), (WINDOW_WIDTH, y))
 
     def draw(self):
-        self.screen.fill(BLACK)
-        self.draw_grid()
+        if self.dirty_rects and not self.full_redraw and not self.game_over:
+            self.draw_dirty()
+        else:
+            self.draw_full()
+            self.full_redraw = False
+        self.dirty.clear()
+        self.profiler.mark('present')
+
+    def draw_cell(self, pos):
+        """Restore one cell from the background and draw what is on it now."""
+        x, y = pos
+        rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+        self.screen.blit(self.background, rect, rect)
+        state = self.grid.get(pos)
+        if state == SNAKE:
+            pygame.draw.rect(self.screen, BLUE if pos == self.snake[0] else GREEN, rect)
+        elif state == FOOD:
+            pygame.draw.rect(self.screen, self.food[pos], rect)
+        return rect
+
+    def draw_dirty(self):
+        rects = [self.draw_cell(pos) for pos in self.dirty]
+
+        # the score sits on top of the board: restore every cell under the
+        # old and new text, then draw the text again
+        score_surf = render_text(self.font, f"Score: {self.score}", True, YELLOW)
+        area = score_surf.get_rect(topleft=(8, 8)).union(self.score_rect)
+        for x in range(area.left // CELL_SIZE, (area.right - 1) // CELL_SIZE + 1):
+            for y in range(area.top // CELL_SIZE, (area.bottom - 1) // CELL_SIZE + 1):
+                rects.append(self.draw_cell((x, y)))
+        self.score_rect = self.screen.blit(score_surf, (8, 8))
+
+        self.profiler.mark('draw')
+        pygame.display.update(rects)
+
+    def draw_full(self):
+        self.screen.blit(self.background, (0, 0))
 
         # Draw all food
-        for (pos, color) in self.food_items:
+        for (pos, color) in self.food.items():
             x, y = pos
             pygame.draw.rect(self.screen, color, (x*CELL_SIZE, y*CELL_SIZE, CELL_SIZE, CELL_SIZE))
 
@@ -174,31 +236,68 @@ class SnakeGame:
                 x, y = pos
                 pygame.draw.circle(self.screen, color, (x*CELL_SIZE + CELL_SIZE//2, y*CELL_SIZE + CELL_SIZE//2), CELL_SIZE//2)
 
-            text = self.large_font.render("pawsome", True, WHITE)
+            text = self.pawsome_text
             rect = text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2))
             self.screen.blit(text, rect)
 
-            sub = self.font.render("Press R to restart", True, WHITE)
+            sub = self.restart_text
             sub_r = sub.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 40))
             self.screen.blit(sub, sub_r)
 
         # Score
-        score_surf = self.font.render(f"Score: {self.score}", True, YELLOW)
-        self.screen.blit(score_surf, (8, 8))
+        score_surf = render_text(self.font, f"Score: {self.score}", True, YELLOW)
+        self.score_rect = self.screen.blit(score_surf, (8, 8))
 
+        self.profiler.mark('draw')
         pygame.display.flip()
 
     def run(self):
+        profiler = self.profiler
         while True:
-            self.handle_input()
+            profiler.start()
+            self.handle_input(pygame.event.get())
+            profiler.mark('input')
             self.update()
+            profiler.mark('update')
             self.draw()
+            profiler.end(self.screen)
             self.clock.tick(self.fps)
 
 
+def bench_draw(frames=3000, seed=0):
+    """Draw time per frame, full redraw against dirty rectangles.
+
+    Both modes replay the same game: the snake steers for the nearest
+    food, and a new game starts whenever it dies.
+    """
+    for dirty_rects in (False, True):
+        random.seed(seed)
+        game = SnakeGame(dirty_rects)
+        total = 0.0
+        for _ in range(frames):
+            if game.game_over:
+                game.reset()
+            hx, hy = game.snake[0]
+            fx, fy = min(game.food, key=lambda p: abs(p[0] - hx) + abs(p[1] - hy))
+            for d in ((1 if fx > hx else -1, 0), (0, 1 if fy > hy else -1), UP, DOWN, LEFT, RIGHT):
+                nx, ny = hx + d[0], hy + d[1]
+                if (0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and game.grid.get((nx, ny)) != SNAKE
+                        and game.food.get((nx, ny)) != RED):
+                    game.next_direction = d
+                    break
+            game.update()
+            start = time.perf_counter()
+            game.draw()
+            total += time.perf_counter() - start
+        print("%-6s %8.3f ms/frame" % ("dirty" if dirty_rects else "full", total / frames * 1000))
+
+
 def main():
-    SnakeGame().run()
+    SnakeGame(dirty_rects="--full-redraw" not in sys.argv, profiler=from_argv(fps=MAX_FPS)).run()
 
 
 if __name__ == "__main__":
-    main()
+    if "--bench" in sys.argv:
+        bench_draw()
+    else:
+        main()
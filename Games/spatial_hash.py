@@ -0,0 +1,110 @@
+"""Uniform-grid spatial hash for broad-phase collision checks.
+
+Objects are dropped into square buckets of `cell_size` pixels, so a
+query only looks at the few objects sharing its buckets instead of
+every object on screen. The hash is cheap enough to rebuild each frame.
+"""
+
+import random
+import time
+from collections import defaultdict
+
+
+class SpatialHash(object):
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.buckets = defaultdict(list)
+
+    def clear(self):
+        self.buckets.clear()
+
+    def insert_point(self, key, x, y):
+        c = self.cell_size
+        self.buckets[(int(x // c), int(y // c))].append(key)
+
+    def insert_box(self, key, x, y, w, h):
+        """Add `key` to every bucket the box from (x, y) to (x + w, y + h) touches."""
+        c = self.cell_size
+        buckets = self.buckets
+        for cx in range(int(x // c), int((x + w) // c) + 1):
+            for cy in range(int(y // c), int((y + h) // c) + 1):
+                buckets[(cx, cy)].append(key)
+
+    def query_point(self, x, y):
+        c = self.cell_size
+        return self.buckets.get((int(x // c), int(y // c)), ())
+
+    def query_box(self, x, y, w, h):
+        """Keys in every bucket the box touches, each reported once."""
+        c = self.cell_size
+        buckets = self.buckets
+        found = set()
+        for cx in range(int(x // c), int((x + w) // c) + 1):
+            for cy in range(int(y // c), int((y + h) // c) + 1):
+                found.update(buckets.get((cx, cy), ()))
+        return found
+
+
+def point_box_hits(points, boxes, size):
+    """Pair up points with the square boxes that strictly contain them.
+
+    Matches the old nested loop: each point, in order, takes the first
+    box in list order that contains it and has not been taken yet.
+    Returns a list of (point index, box index).
+    """
+    grid = SpatialHash(size)
+    for i, (bx, by) in enumerate(boxes):
+        grid.insert_box(i, bx, by, size, size)
+
+    taken = set()
+    hits = []
+    for i, (px, py) in enumerate(points):
+        best = None
+        for j in grid.query_point(px, py):
+            bx, by = boxes[j]
+            if (bx < px < bx + size and by < py < by + size and j not in taken
+                    and (best is None or j < best)):
+                best = j
+        if best is not None:
+            taken.add(best)
+            hits.append((i, best))
+    return hits
+
+
+def _naive_hits(points, boxes, size):
+    boxes = list(enumerate(boxes))
+    hits = []
+    for i, (px, py) in enumerate(points):
+        for k, (j, (bx, by)) in enumerate(boxes):
+            if bx < px < bx + size and by < py < by + size:
+                hits.append((i, j))
+                del boxes[k]
+                break
+    return hits
+
+
+def bench(counts=(100, 1000, 10000), width=800, height=600, size=30, seed=0):
+    """Bullets against targets: spatial hash vs the nested loop.
+
+    The nested loop is quadratic, so it is skipped above 2000 objects.
+    """
+    rng = random.Random(seed)
+    print("%8s %12s %12s %8s" % ("objects", "hash ms", "nested ms", "hits"))
+    for n in counts:
+        bullets = [(rng.uniform(0, width), rng.uniform(0, height)) for _ in range(n)]
+        targets = [(rng.randint(0, width - size), rng.randint(0, height - size)) for _ in range(n)]
+        start = time.perf_counter()
+        hits = point_box_hits(bullets, targets, size)
+        fast = (time.perf_counter() - start) * 1000
+
+        slow = '-'
+        if n <= 2000:
+            start = time.perf_counter()
+            assert _naive_hits(bullets, targets, size) == hits
+            slow = "%.1f" % ((time.perf_counter() - start) * 1000)
+        print("%8d %12.2f %12s %8d" % (n, fast, slow, len(hits)))
+
+
+if __name__ == "__main__":
+    bench()
@@ -1,15 +1,29 @@
-import pygame
+import functools
+import os
 import sys
 import random
-import threading
 import math
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+if "--bench" in sys.argv:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from entities import EntityArrays
+from profiler import DISABLED, from_argv
+from scheduler import Scheduler
+from spatial_hash import point_box_hits
+from textcache import render_text
 
 pygame.init()
 
 # Window
 WIDTH, HEIGHT = 800, 600
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Cartoony Tank Game")
 
 # Colors (bright, cartoony)
 WHITE = (255, 255, 255)
@@ -21,61 +35,38 @@ YELLOW = (255, 240, 0)
 BLACK = (0, 0, 0)
 BLUE = (100, 160, 255)
 BIRD_COLOR = (255, 255, 255)
+SPRITE_KEY = (1, 2, 3)
 
 # Tank properties
-tank_x = WIDTH // 2
-tank_y = HEIGHT // 2
 tank_speed = 5
 tank_size = 40
 
-# Game state
-alive = True
-
 # Bullets
-bullets = []
 bullet_speed = 10
 
 # Targets
-targets = []
 TARGET_SIZE = 30
 TARGET_SPAWN_TIME = 120
-spawn_timer = 0
 
 # Birds
-birds = []
 BIRD_SIZE = 30
 BIRD_SPAWN_TIME = 150
-bird_timer = 0
 BIRD_SPEED = 2.5
 
 # Explosion animation
-explosions = []   # each: [x, y, frame]
 EXPLOSION_FRAMES = 10
 
-# Score
-score = 0
-font = pygame.font.SysFont("Comic Sans MS", 28)  # Cartoon font
-
-# Benedict status
-benedict67 = False
-timer_done = True
-
-clock = pygame.time.Clock()
-running = True
+# Delays, in frames at 60 FPS
+BANNER_FRAMES = 5 * 60
+RESPAWN_FRAMES = 60
 
 
 # ----------------------------
 # HELPERS
 # ----------------------------
 
-def spawn_target():
-    x = random.randint(0, WIDTH - TARGET_SIZE)
-    y = random.randint(0, HEIGHT - TARGET_SIZE)
-    targets.append([x, y])
-
-
-def spawn_bird():
-    """Spawn a bird at a random screen edge."""
+def bird_start():
+    """A random spot just off one screen edge."""
     side = random.choice(["top", "bottom", "left", "right"])
 
     if side == "top":
@@ -91,21 +82,29 @@ def spawn_bird():
         x = WIDTH
         y = random.randint(0, HEIGHT - BIRD_SIZE)
 
-    birds.append([x, y])
+    return x, y
 
 
-def respawn_tank():
-    """Respawn tank in center."""
-    global tank_x, tank_y, alive, score
-    tank_x = WIDTH // 2
-    tank_y = HEIGHT // 2
-    alive = True
-    score = 0
+def move_birds_lists(birds, tank_x, tank_y):
+    """The old per-bird homing loop over [x, y] lists, kept for the benchmark."""
+    for bird in birds:
+        dx = tank_x - bird[0]
+        dy = tank_y - bird[1]
+        dist = math.hypot(dx, dy)
+
+        if dist != 0:
+            bird[0] += (dx / dist) * BIRD_SPEED
+            bird[1] += (dy / dist) * BIRD_SPEED
 
 
-def set_variable():
-    global timer_done
-    timer_done = True
+def move_birds(birds, tank_x, tank_y):
+    """Step every bird BIRD_SPEED towards the tank."""
+    dx = tank_x - birds['x']
+    dy = tank_y - birds['y']
+    dist = np.hypot(dx, dy)
+    moving = dist != 0
+    birds['x'] += np.divide(dx, dist, out=np.zeros_like(dx), where=moving) * BIRD_SPEED
+    birds['y'] += np.divide(dy, dist, out=np.zeros_like(dy), where=moving) * BIRD_SPEED
 
 
 def draw_cartoon_tank(surface, x, y):
@@ -158,114 +157,279 @@ def draw_bird(surface, x, y):
                          (x + BIRD_SIZE // 2, y + BIRD_SIZE // 2)])
 
 
-# ----------------------------
-# MAIN LOOP
-# ----------------------------
+@functools.lru_cache(maxsize=None)
+def bird_sprite():
+    surface = pygame.Surface((BIRD_SIZE + 1, BIRD_SIZE // 2 + 1)).convert()
+    surface.fill(SPRITE_KEY)
+    surface.set_colorkey(SPRITE_KEY, pygame.RLEACCEL)
+    draw_bird(surface, 0, 0)
+    return surface
 
-while running:
-    clock.tick(60)
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-
-        # Fire bullet
-        if event.type == pygame.KEYDOWN and alive:
-            if event.key == pygame.K_SPACE:
-                bullets.append([tank_x + tank_size//2 - 4, tank_y])
-
-    if alive:
-        # Movement
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT] and tank_x > 0:
-            tank_x -= tank_speed
-        if keys[pygame.K_RIGHT] and tank_x < WIDTH - tank_size:
-            tank_x += tank_speed
-        if keys[pygame.K_UP] and tank_y > 0:
-            tank_y -= tank_speed
-        if keys[pygame.K_DOWN] and tank_y < HEIGHT - tank_size:
-            tank_y += tank_speed
-
-    # Move bullets
-    for bullet in bullets:
-        bullet[1] -= bullet_speed
-    bullets = [b for b in bullets if b[1] > -20]
-
-    # Spawn targets
-    spawn_timer += 1
-    if spawn_timer >= TARGET_SPAWN_TIME:
-        spawn_target()
-        spawn_timer = 0
-
-    # Spawn birds
-    bird_timer += 1
-    if bird_timer >= BIRD_SPAWN_TIME:
-        spawn_bird()
-        bird_timer = 0
-
-    # Move birds toward tank
-    for bird in birds:
-        dx = tank_x - bird[0]
-        dy = tank_y - bird[1]
-        dist = math.hypot(dx, dy)
-
-        if dist != 0:
-            bird[0] += (dx / dist) * BIRD_SPEED
-            bird[1] += (dy / dist) * BIRD_SPEED
-
-    # Bird kills tank
-    for bird in birds:
-        if alive and abs(bird[0] - tank_x) < BIRD_SIZE and abs(bird[1] - tank_y) < BIRD_SIZE:
-            alive = False
-            respawn_tank()
-
-    # Bullet collisions
-    for bullet in bullets[:]:
-        for target in targets[:]:
-            if target[0] < bullet[0] < target[0] + TARGET_SIZE and \
-               target[1] < bullet[1] < target[1] + TARGET_SIZE:
 
-                explosions.append([target[0], target[1], 0])
-                bullets.remove(bullet)
-                targets.remove(target)
-                score += 10
+def draw_birds(surface, birds):
+    """Blit the cached bird wherever it matches draw_bird pixel for pixel.
 
-                benedict67 = True
-                timer_done = False
-                threading.Timer(5.0, set_variable).start()
+    Past the top or left edge pygame rounds the ellipse and the beak
+    differently, so the few birds there are drawn directly, and birds
+    entirely off that edge are skipped.
+    """
+    x, y = birds['x'], birds['y']
+    inside = (x >= 0) & (y >= 0)
+    edge = ~inside & (x > -BIRD_SIZE - 2) & (y > -BIRD_SIZE - 2)
+    for bx, by in zip(x[edge].tolist(), y[edge].tolist()):
+        draw_bird(surface, bx, by)
+    sprite = bird_sprite()
+    surface.blits([(sprite, pos) for pos in zip(x[inside].astype(int).tolist(),
+                                                y[inside].astype(int).tolist())],
+                  doreturn=False)
 
-                break
 
-    # Update explosions
-    for explosion in explosions[:]:
-        explosion[2] += 1
-        if explosion[2] > EXPLOSION_FRAMES:
-            explosions.remove(explosion)
-
-    # Draw scene
-    WIN.fill(BLUE)
-
-    if alive:
-        draw_cartoon_tank(WIN, tank_x, tank_y)
-
-    for bullet in bullets:
-        draw_cartoon_bullet(WIN, bullet[0], bullet[1])
-
-    for target in targets:
-        draw_cartoon_target(WIN, target[0], target[1])
-
-    for x, y, frame in explosions:
-        draw_cartoon_explosion(WIN, x, y, frame)
+# ----------------------------
+# GAME
+# ----------------------------
 
-    for bird in birds:
-        draw_bird(WIN, bird[0], bird[1])
+class TankGame:
+    def __init__(self, profiler=DISABLED):
+        pygame.display.set_caption("Cartoony Tank Game")
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        self.clock = pygame.time.Clock()
+        self.font = pygame.font.SysFont("Comic Sans MS", 28)  # Cartoon font
+        self.benedict_text = self.font.render("Benedict 67!", True, BLACK)
+
+        # one EntityArrays per kind; explosions age by `frame`
+        self.bullets = EntityArrays(('x', 'y'), np.int64)
+        self.targets = EntityArrays(('x', 'y'), np.int64)
+        self.birds = EntityArrays(('x', 'y'), np.float64)
+        self.explosions = EntityArrays(('x', 'y', 'frame'), np.int64)
+
+        self.tank_x = WIDTH // 2
+        self.tank_y = HEIGHT // 2
+        self.alive = True
+        self.score = 0
+
+        # every delayed event runs off the frame clock, ticked in update()
+        self.scheduler = Scheduler()
+        self.scheduler.every(TARGET_SPAWN_TIME, self.spawn_target)
+        self.scheduler.every(BIRD_SPAWN_TIME, self.spawn_bird)
+
+        # Benedict status
+        self.benedict67 = False
+        self.banner = None
+
+        self.profiler = profiler
+
+    def spawn_target(self):
+        x = random.randint(0, WIDTH - TARGET_SIZE)
+        y = random.randint(0, HEIGHT - TARGET_SIZE)
+        self.targets.spawn(x, y)
+
+    def spawn_bird(self):
+        """Spawn a bird at a random screen edge."""
+        self.birds.spawn(*bird_start())
+
+    def respawn_tank(self):
+        """Respawn tank in center."""
+        self.tank_x = WIDTH // 2
+        self.tank_y = HEIGHT // 2
+        self.alive = True
+        self.score = 0
+
+    def show_banner(self):
+        """Show "Benedict 67!" for BANNER_FRAMES after the latest hit."""
+        self.benedict67 = True
+        self.scheduler.cancel(self.banner)
+        self.banner = self.scheduler.after(BANNER_FRAMES, self.hide_banner)
+
+    def hide_banner(self):
+        self.benedict67 = False
+        self.banner = None
+
+    def fire(self):
+        self.bullets.spawn(self.tank_x + tank_size//2 - 4, self.tank_y)
+
+    def handle_input(self, events):
+        for event in events:
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+
+            # Fire bullet
+            if event.type == pygame.KEYDOWN and self.alive:
+                if event.key == pygame.K_SPACE:
+                    self.fire()
+
+    def update(self, keys):
+        if self.alive:
+            # Movement
+            if keys[pygame.K_LEFT] and self.tank_x > 0:
+                self.tank_x -= tank_speed
+            if keys[pygame.K_RIGHT] and self.tank_x < WIDTH - tank_size:
+                self.tank_x += tank_speed
+            if keys[pygame.K_UP] and self.tank_y > 0:
+                self.tank_y -= tank_speed
+            if keys[pygame.K_DOWN] and self.tank_y < HEIGHT - tank_size:
+                self.tank_y += tank_speed
+
+        # Move bullets
+        bullets = self.bullets
+        bullets['y'] -= bullet_speed
+        bullets.keep(bullets['y'] > -20)
+
+        # Spawn targets and birds, respawn the tank, hide the banner
+        self.scheduler.tick()
+
+        # Move birds toward tank
+        birds = self.birds
+        move_birds(birds, self.tank_x, self.tank_y)
+        self.profiler.mark('update')
+
+        # Bird kills tank
+        if self.alive and np.any((np.abs(birds['x'] - self.tank_x) < BIRD_SIZE) &
+                                 (np.abs(birds['y'] - self.tank_y) < BIRD_SIZE)):
+            self.alive = False
+            self.scheduler.after(RESPAWN_FRAMES, self.respawn_tank)
+
+        # Bullet collisions
+        targets = self.targets
+        hits = point_box_hits(bullets.rows(), targets.rows(), TARGET_SIZE)
+        if hits:
+            hit_bullets = np.ones(len(bullets), bool)
+            hit_targets = np.ones(len(targets), bool)
+            for b, t in hits:
+                self.explosions.spawn(targets['x'][t], targets['y'][t], 0)
+                self.score += 10
+                hit_bullets[b] = hit_targets[t] = False
+                self.show_banner()
+
+            bullets.keep(hit_bullets)
+            targets.keep(hit_targets)
+        self.profiler.mark('collision')
+
+        # Update explosions
+        explosions = self.explosions
+        explosions['frame'] += 1
+        explosions.keep(explosions['frame'] <= EXPLOSION_FRAMES)
+
+    def draw(self):
+        screen = self.screen
+        screen.fill(BLUE)
+
+        if self.alive:
+            draw_cartoon_tank(screen, self.tank_x, self.tank_y)
+
+        for x, y in self.bullets.rows():
+            draw_cartoon_bullet(screen, x, y)
+
+        for x, y in self.targets.rows():
+            draw_cartoon_target(screen, x, y)
+
+        for x, y, frame in self.explosions.rows():
+            draw_cartoon_explosion(screen, x, y, frame)
+
+        draw_birds(screen, self.birds)
+
+        score_text = render_text(self.font, f"Score: {self.score}", True, BLACK)
+        screen.blit(score_text, (10, 10))
+
+        if self.benedict67:
+            screen.blit(self.benedict_text, (10, 50))
+
+        self.profiler.mark('draw')
+        pygame.display.update()
+        self.profiler.mark('present')
+
+    def run(self):
+        profiler = self.profiler
+        while True:
+            self.clock.tick(60)
+            profiler.start()
+            self.handle_input(pygame.event.get())
+            keys = pygame.key.get_pressed()
+            profiler.mark('input')
+            self.update(keys)
+            profiler.mark('update')
+            self.draw()
+            profiler.end(self.screen)
 
-    score_text = font.render(f"Score: {score}", True, BLACK)
-    WIN.blit(score_text, (10, 10))
 
-    if benedict67 and not timer_done:
-        benedict_text = font.render("Benedict 67!", True, BLACK)
-        WIN.blit(benedict_text, (10, 50))
+# ----------------------------
+# BENCHMARK
+# ----------------------------
 
-    pygame.display.update()
+def bench_birds(counts=(100, 1000, 5000), frames=300, seed=0):
+    """Per-frame cost of a swarm of homing birds, headless.
+
+    Times the old per-bird list loop against the array update, then a
+    whole update + draw frame of the game with that many birds.
+    """
+    print("%8s %12s %12s %12s" % ("birds", "lists ms", "arrays ms", "frame ms"))
+    for n in counts:
+        random.seed(seed)
+        game = TankGame()
+        for _ in range(n):
+            game.spawn_bird()
+        birds = [list(b) for b in game.birds.rows()]
+        tank_x, tank_y = game.tank_x, game.tank_y
+        keys = pygame.key.ScancodeWrapper([False] * 512)
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            move_birds_lists(birds, tank_x, tank_y)
+        lists = (time.perf_counter() - start) / frames * 1000
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            move_birds(game.birds, tank_x, tank_y)
+        arrays = (time.perf_counter() - start) / frames * 1000
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            game.update(keys)
+            game.draw()
+        frame = (time.perf_counter() - start) / frames * 1000
+        print("%8d %12.3f %12.3f %12.3f" % (n, lists, arrays, frame))
+
+
+def bench_fire(frames=6000, sample=1000, seed=0):
+    """Sustained fire: a hit every frame, with threads and memory sampled.
+
+    A target is placed in the path of every bullet, so the banner is
+    restarted each frame. The spawn timers are dropped and birds are
+    cleared, so the only entities are the ones being shot. Thread count
+    and traced memory must stay flat.
+    """
+    random.seed(seed)
+    game = TankGame()
+    game.scheduler.clear()
+    keys = pygame.key.ScancodeWrapper([False] * 512)
+    tracemalloc.start()
+    threads = []
+    memory = []
+    print("%8s %8s %8s %12s" % ("frame", "hits", "threads", "traced KiB"))
+    for frame in range(1, frames + 1):
+        game.birds.clear()
+        game.targets.spawn(game.tank_x + 5, game.tank_y - 100)
+        game.fire()
+        game.update(keys)
+        game.draw()
+        if frame % sample == 0:
+            threads.append(threading.active_count())
+            memory.append(tracemalloc.get_traced_memory()[0])
+            print("%8d %8d %8d %12.1f" % (frame, game.score // 10, threads[-1], memory[-1] / 1024))
+    tracemalloc.stop()
+    assert game.benedict67 and len(game.scheduler) == 1
+    assert len(set(threads)) == 1, threads
+    assert max(memory[1:]) - min(memory[1:]) < 4 * 1024, memory
+
+
+def main():
+    TankGame(profiler=from_argv()).run()
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        bench_birds()
+        bench_fire()
+        pygame.quit()
+    else:
+        main()
@@ -0,0 +1,45 @@
+"""Rendered text surfaces, cached across frames.
+
+Font.render rasterizes the string every call, which is one of the
+slower things a frame does. render_text keeps the most recent surfaces
+in an LRU keyed by font, string, antialias and color, so a score is
+only rendered again when it changes. The surfaces are shared: blit
+them, never draw on them.
+"""
+
+import functools
+import os
+import sys
+import time
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+
+@functools.lru_cache(maxsize=256)
+def render_text(font, text, antialias, color):
+    return font.render(text, antialias, color)
+
+
+def bench(frames=6000, change_every=60):
+    """Per-frame cost of a score label, rendered every frame vs cached.
+
+    The score changes once every `change_every` frames.
+    """
+    pygame.init()
+    screen = pygame.display.set_mode((400, 300))
+    font = pygame.font.SysFont(None, 28)
+    for name, render in (("render", font.render),
+                         ("cached", functools.partial(render_text, font))):
+        start = time.perf_counter()
+        for frame in range(frames):
+            screen.blit(render(f"Score: {frame // change_every}", True, (0, 0, 0)), (10, 10))
+        elapsed = time.perf_counter() - start
+        print("%-8s %8.2f us/frame" % (name, elapsed / frames * 1e6))
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    bench(*map(int, sys.argv[1:3]))
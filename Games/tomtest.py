@@ -1,7 +1,20 @@
-import pygame
-import pygame.gfxdraw
+import functools
+import itertools
+import os
 import random
 import sys
+import time
+from array import array
+from collections import deque
+
+if "--bench" in sys.argv:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pygame.gfxdraw
+
+from profiler import DISABLED, from_argv
+from textcache import render_text
 
 
 # =========================
@@ -19,6 +32,9 @@ screen = pygame.display.set_mode((WIDTH, HEIGHT))
 clock = pygame.time.Clock()
 
 FONT = pygame.font.SysFont("Times", 30, bold=True, italic=False)
+GAME_OVER_TEXT = FONT.render("Game Over! Press SPACE to restart.", True, (255, 255, 255))
+
+BACKGROUND = (20, 20, 20)
 
 
 # =========================
@@ -32,33 +48,82 @@ def random_grid_pos():
 # Snake Class
 # =========================
 class Snake:
-    def __init__(self):
-        self.body = [[GRID_W // 2, GRID_H // 2]]
+    """Snake body as a deque of packed cells (y * grid_w + x).
+
+    `occupied` counts the segments on each cell, so moving, growing and
+    checking for self-collision are O(1) whatever the length. `entered`
+    remembers the move on which each cell became the head, which gives
+    a segment's index from its cell.
+    """
+
+    def __init__(self, grid_w=GRID_W, grid_h=GRID_H):
+        self.grid_w = grid_w
+        self.grid_h = grid_h
+        self.buffer = deque()
+        self.reset()
+
+    def reset(self):
+        self.body = deque([self.pack(self.grid_w // 2, self.grid_h // 2)])
+        self.occupied = bytearray(self.grid_w * self.grid_h)
+        self.occupied[self.body[0]] = 1
+        self.moves = 0
+        self.entered = array('q', [0]) * (self.grid_w * self.grid_h)
         self.direction = [1, 0]
         self.length = 5
         self.speed = 8
-        self.buffer = []
+        self.buffer.clear()
+
+    def pack(self, x, y):
+        return y * self.grid_w + x
+
+    def unpack(self, cell):
+        y, x = divmod(cell, self.grid_w)
+        return [x, y]
+
+    @property
+    def head(self):
+        return self.unpack(self.body[0])
+
+    def segment(self, i):
+        return self.unpack(self.body[i])
+
+    def segments(self):
+        """[x, y] of every segment, head first."""
+        w = self.grid_w
+        for cell in self.body:
+            y, x = divmod(cell, w)
+            yield [x, y]
+
+    def occupies(self, pos):
+        return self.occupied[self.pack(*pos)] > 0
+
+    def index_at(self, cell):
+        """Index of the segment on a packed cell, or None if it is empty."""
+        if not self.occupied[cell]:
+            return None
+        return self.moves - self.entered[cell]
 
     def move(self):
         if self.buffer:
-            self.direction = self.buffer.pop(0)
+            self.direction = self.buffer.popleft()
 
-        head = [
-            self.body[0][0] + self.direction[0],
-            self.body[0][1] + self.direction[1]
-        ]
+        y, x = divmod(self.body[0], self.grid_w)
 
         # Wrap-around
-        head[0] %= GRID_W
-        head[1] %= GRID_H
+        x = (x + self.direction[0]) % self.grid_w
+        y = (y + self.direction[1]) % self.grid_h
 
-        self.body.insert(0, head)
+        head = self.pack(x, y)
+        self.body.appendleft(head)
+        self.occupied[head] += 1
+        self.moves += 1
+        self.entered[head] = self.moves
 
         if len(self.body) > self.length:
-            self.body.pop()
+            self.occupied[self.body.pop()] -= 1
 
     def collide_self(self):
-        return self.body[0] in self.body[1:]
+        return self.occupied[self.body[0]] > 1
 
 
 # =========================
@@ -86,65 +151,118 @@ class Obstacle:
 # =========================
 # REALISTIC SNAKE RENDERER
 # =========================
+def segment_style(i, TILE):
+    # Realistic gradient: head bright → tail darker
+    shade = max(40, 200 - i * 2)
+
+    # Natural taper (head largest)
+    radius = max(4, TILE // 2 - i // 18)
+    return shade, radius
+
+
+# every segment from here to the tail looks the same
+STABLE_SEGMENT = max((200 - 40) // 2, (TILE // 2 - 4) * 18)
+
+
+# =========================
+# Sprite Cache
+# =========================
+# Segments, fruits and obstacles only come in a handful of looks, so each
+# look is painted once onto a sprite and blitted from then on. Sprites
+# have a one pixel margin because the largest circles reach just past
+# their tile, and use the background color as their color key.
+def sprite_surface(TILE):
+    surface = pygame.Surface((TILE + 2, TILE + 2)).convert()
+    surface.fill(BACKGROUND)
+    surface.set_colorkey(BACKGROUND, pygame.RLEACCEL)
+    return surface
+
+
+def sprite_pos(part, TILE):
+    return part[0] * TILE - 1, part[1] * TILE - 1
+
+
+@functools.lru_cache(maxsize=None)
+def segment_sprite(shade, radius, TILE):
+    surface = sprite_surface(TILE)
+    paint_segment(surface, TILE // 2 + 1, TILE // 2 + 1, shade, radius)
+    return surface
+
+
+@functools.lru_cache(maxsize=None)
+def segment_sprites(TILE):
+    """Sprite for each index up to STABLE_SEGMENT, which covers the rest."""
+    return [segment_sprite(*segment_style(i, TILE), TILE) for i in range(STABLE_SEGMENT + 1)]
+
+
+@functools.lru_cache(maxsize=None)
+def fruit_sprite(type, TILE):
+    surface = sprite_surface(TILE)
+    paint_fruit(surface, TILE // 2 + 1, TILE // 2 + 1, type, TILE)
+    return surface
+
+
+@functools.lru_cache(maxsize=None)
+def obstacle_sprite(TILE):
+    surface = sprite_surface(TILE)
+    paint_obstacle(surface, TILE // 2 + 1, TILE // 2 + 1, TILE)
+    return surface
+
+
 def draw_snake(screen, snake, TILE):
     """Realistic smooth snake with shading + tapered tail."""
-    for i, part in enumerate(snake.body):
-
-        x = part[0] * TILE
-        y = part[1] * TILE
-
-        # Realistic gradient: head bright → tail darker
-        shade = max(40, 200 - i * 2)
-        color = (0, shade, 0)
-
-        cx = x + TILE // 2
-        cy = y + TILE // 2
-
-        # Natural taper (head largest)
-        radius = max(4, TILE // 2 - i // 18)
-
-        # Main body
-        pygame.gfxdraw.filled_circle(screen, cx, cy, radius, color)
-        pygame.gfxdraw.aacircle(screen, cx, cy, radius, color)
-
-        # Highlight for shiny snake skin
-        highlight = (
-            min(color[0] + 40, 255),
-            min(color[1] + 40, 255),
-            min(color[2] + 40, 255)
-        )
-
-        pygame.gfxdraw.filled_circle(
-            screen,
-            cx - radius // 2,
-            cy - radius // 3,
-            max(2, radius // 3),
-            highlight
-        )
-
-        # Lower shadow shading
-        shadow = (
-            max(color[0] - 50, 0),
-            max(color[1] - 50, 0),
-            max(color[2] - 50, 0)
-        )
-
-        pygame.gfxdraw.filled_circle(
-            screen,
-            cx + radius // 3,
-            cy + radius // 4,
-            max(2, radius // 2),
-            shadow
-        )
+    sprites = segment_sprites(TILE)
+    last = len(sprites) - 1
+    screen.blits([(sprites[min(i, last)], sprite_pos(part, TILE))
+                  for i, part in enumerate(snake.segments())], doreturn=False)
+
+
+def paint_segment(screen, cx, cy, shade, radius):
+    color = (0, shade, 0)
+
+    # Main body
+    pygame.gfxdraw.filled_circle(screen, cx, cy, radius, color)
+    pygame.gfxdraw.aacircle(screen, cx, cy, radius, color)
+
+    # Highlight for shiny snake skin
+    highlight = (
+        min(color[0] + 40, 255),
+        min(color[1] + 40, 255),
+        min(color[2] + 40, 255)
+    )
+
+    pygame.gfxdraw.filled_circle(
+        screen,
+        cx - radius // 2,
+        cy - radius // 3,
+        max(2, radius // 3),
+        highlight
+    )
+
+    # Lower shadow shading
+    shadow = (
+        max(color[0] - 50, 0),
+        max(color[1] - 50, 0),
+        max(color[2] - 50, 0)
+    )
+
+    pygame.gfxdraw.filled_circle(
+        screen,
+        cx + radius // 3,
+        cy + radius // 4,
+        max(2, radius // 2),
+        shadow
+    )
 
 
 # =========================
 # Fruit Renderer
 # =========================
 def draw_fruit(screen, fruit, TILE):
-    x = fruit.pos[0] * TILE
-    y = fruit.pos[1] * TILE
+    screen.blit(fruit_sprite(fruit.type, TILE), sprite_pos(fruit.pos, TILE))
 
+
+def paint_fruit(screen, cx, cy, type, TILE):
     colors = {
         "normal": (255, 60, 60),
         "big": (255, 140, 0),
@@ -152,11 +270,9 @@ def draw_fruit(screen, fruit, TILE):
         "speed": (255, 0, 255)
     }
 
-    base_color = colors.get(fruit.type, (255, 0, 0))
+    base_color = colors.get(type, (255, 0, 0))
 
     radius = TILE // 2 - 1
-    cx = x + TILE // 2
-    cy = y + TILE // 2
 
     pygame.gfxdraw.filled_circle(screen, cx, cy, radius, base_color)
     pygame.gfxdraw.aacircle(screen, cx, cy, radius, base_color)
@@ -173,45 +289,145 @@ def draw_fruit(screen, fruit, TILE):
 # Obstacle Renderer
 # =========================
 def draw_obstacle(screen, obs, TILE):
-    x = obs.pos[0] * TILE
-    y = obs.pos[1] * TILE
+    screen.blit(obstacle_sprite(TILE), sprite_pos(obs.pos, TILE))
+
 
+def paint_obstacle(screen, cx, cy, TILE):
     base_color = (150, 150, 150)
 
-    pygame.gfxdraw.filled_circle(screen, x + TILE // 2, y + TILE // 2, TILE // 2 - 2, base_color)
-    pygame.gfxdraw.aacircle(screen, x + TILE // 2, y + TILE // 2, TILE // 2 - 2, base_color)
+    pygame.gfxdraw.filled_circle(screen, cx, cy, TILE // 2 - 2, base_color)
+    pygame.gfxdraw.aacircle(screen, cx, cy, TILE // 2 - 2, base_color)
 
 
 # =========================
-# Respawn Helper
+# Dirty-Rect Renderer
 # =========================
-def respawn_snake(snake):
-    snake.body = [[GRID_W // 2, GRID_H // 2]]
-    snake.length = 5
-    snake.direction = [1, 0]
-    snake.speed = 8
-    snake.buffer.clear()
+class BoardRenderer:
+    """Draws each frame, repainting only the cells that changed.
+
+    Segments past STABLE_SEGMENT look the same whatever their index, so
+    a frame only touches the front of the snake, the cell the tail left,
+    the fruits, the obstacles and the score, and pushes just those rects.
+    Cells are cleared one pixel wider than a tile because the biggest
+    circles spill that far; everything is then repainted in the full
+    draw order. dirty_rects=False redraws the whole window every frame.
+    """
+
+    def __init__(self, screen, dirty_rects=True, profiler=DISABLED):
+        self.screen = screen
+        self.dirty_rects = dirty_rects
+        self.profiler = profiler
+        self.snake = None
+        self.prev_cells = set()
+        self.prev_tail = None
+        self.score_rect = pygame.Rect(10, 10, 0, 0)
+
+    def draw(self, snake, fruits, obstacles, score):
+        score_text = render_text(FONT, f"Score: {score}", True, (255, 255, 255))
+        if self.dirty_rects and snake is self.snake:
+            self.draw_dirty(snake, fruits, obstacles, score_text)
+        else:
+            self.draw_full(snake, fruits, obstacles, score_text)
+
+        # things that may have moved by the next frame
+        self.snake = snake
+        self.prev_tail = snake.body[-1]
+        self.prev_cells = {snake.pack(*item.pos) for item in itertools.chain(fruits, obstacles)}
+        self.prev_cells.update(self.cells_under(self.score_rect, snake))
+
+    def draw_full(self, snake, fruits, obstacles, score_text):
+        self.screen.fill(BACKGROUND)
+        draw_snake(self.screen, snake, TILE)
+
+        for f in fruits:
+            draw_fruit(self.screen, f, TILE)
+        for obs in obstacles:
+            draw_obstacle(self.screen, obs, TILE)
+
+        self.score_rect = self.screen.blit(score_text, (10, 10))
+
+        self.profiler.mark('draw')
+        pygame.display.flip()
+
+    def draw_dirty(self, snake, fruits, obstacles, score_text):
+        cells = set(itertools.islice(snake.body, STABLE_SEGMENT + 1))
+        if snake.body[-1] != self.prev_tail:
+            cells.add(self.prev_tail)
+        cells.update(self.prev_cells)
+        cells.update(snake.pack(*item.pos) for item in itertools.chain(fruits, obstacles))
+        cells.update(self.cells_under(score_text.get_rect(topleft=(10, 10)), snake))
+
+        bounds = self.screen.get_rect()
+        rects = []
+        for cell in cells:
+            x, y = snake.unpack(cell)
+            rect = pygame.Rect(x * TILE - 1, y * TILE - 1, TILE + 2, TILE + 2).clip(bounds)
+            self.screen.fill(BACKGROUND, rect)
+            rects.append(rect)
+
+        sprites = segment_sprites(TILE)
+        last = len(sprites) - 1
+        segments = sorted((snake.index_at(cell), cell) for cell in cells if snake.occupied[cell])
+        self.screen.blits([(sprites[min(i, last)], sprite_pos(snake.unpack(cell), TILE))
+                           for i, cell in segments], doreturn=False)
+        for f in fruits:
+            draw_fruit(self.screen, f, TILE)
+        for obs in obstacles:
+            draw_obstacle(self.screen, obs, TILE)
+        self.score_rect = self.screen.blit(score_text, (10, 10))
+
+        self.profiler.mark('draw')
+        pygame.display.update(rects)
+
+    def cells_under(self, rect, snake):
+        for x in range(rect.left // TILE, (rect.right - 1) // TILE + 1):
+            for y in range(rect.top // TILE, (rect.bottom - 1) // TILE + 1):
+                yield snake.pack(x, y)
 
 
 # =========================
-# Main Game Loop
+# Respawn Helper
 # =========================
-def main():
-    snake = Snake()
-    fruits = [Fruit(random.choice(["normal", "big", "slow", "speed"])) for _ in range(3)]
-    obstacles = [Obstacle() for _ in range(5)]
-    score = 0
+def respawn_snake(snake):
+    snake.reset()
 
-    while True:
-        clock.tick(10)
 
-        # Input
-        for event in pygame.event.get():
+# =========================
+# Game State
+# =========================
+class TomGame:
+    """One round after another: input, update and draw, a frame at a time.
+
+    When the snake dies the round is over; the game-over screen stays up
+    until SPACE starts a new one.
+    """
+
+    def __init__(self, dirty_rects=True, profiler=DISABLED):
+        self.dirty_rects = dirty_rects
+        self.profiler = profiler
+        self.reset()
+
+    def reset(self):
+        self.renderer = BoardRenderer(screen, self.dirty_rects, self.profiler)
+        self.snake = Snake()
+        self.fruits = [Fruit(random.choice(["normal", "big", "slow", "speed"])) for _ in range(3)]
+        self.obstacles = [Obstacle() for _ in range(5)]
+        self.score = 0
+        self.over = False
+        self.over_drawn = False
+
+    def handle_input(self, events):
+        snake = self.snake
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
 
-            if event.type == pygame.KEYDOWN:
+            if event.type == pygame.KEYDOWN and self.over:
+                if event.key == pygame.K_SPACE:
+                    self.reset()
+                    snake = self.snake
+            elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_UP and snake.direction != [0, 1]:
                     snake.buffer.append([0, -1])
                 if event.key == pygame.K_DOWN and snake.direction != [0, -1]:
@@ -221,28 +437,36 @@ def main():
                 if event.key == pygame.K_RIGHT and snake.direction != [-1, 0]:
                     snake.buffer.append([1, 0])
 
+    def update(self):
+        if self.over:
+            return
+        snake = self.snake
         snake.move()
+        self.profiler.mark('update')
 
         # Collision with self
         if snake.collide_self():
+            self.over = True
             return
 
         # Obstacle collision
-        for obs in obstacles:
+        for obs in self.obstacles:
             obs.move()
-            if snake.body[0] == obs.pos:
+            if snake.head == obs.pos:
+                self.over = True
                 return
 
         # Fruit collision
+        fruits = self.fruits
         for f in list(fruits):
-            if snake.body[1] == f.pos:
+            if snake.segment(1) == f.pos:
 
                 if f.type == "normal":
                     snake.length += 1
-                    score += 1
+                    self.score += 1
                 elif f.type == "big":
                     snake.length += 3
-                    score += 5
+                    self.score += 5
                 elif f.type == "slow":
                     snake.speed = max(4, snake.speed - 2)
                 elif f.type == "speed":
@@ -250,38 +474,141 @@ def main():
 
                 fruits.remove(f)
                 fruits.append(Fruit(random.choice(["normal", "big", "slow", "speed"])))
+        self.profiler.mark('collision')
 
-        # Draw frame
-        screen.fill((20, 20, 20))
-        draw_snake(screen, snake, TILE)
+    def draw(self):
+        if not self.over:
+            self.renderer.draw(self.snake, self.fruits, self.obstacles, self.score)
+        elif not self.over_drawn:
+            screen.fill((0, 0, 0))
+            screen.blit(GAME_OVER_TEXT, (200, 260))
+            self.profiler.mark('draw')
+            pygame.display.flip()
+            self.over_drawn = True
+        self.profiler.mark('present')
 
-        for f in fruits:
-            draw_fruit(screen, f, TILE)
-        for obs in obstacles:
-            draw_obstacle(screen, obs, TILE)
 
-        score_text = FONT.render(f"Score: {score}", True, (255, 255, 255))
-        screen.blit(score_text, (10, 10))
-
-        pygame.display.flip()
+# =========================
+# Main Game Loop
+# =========================
+def main():
+    profiler = from_argv(fps=10)
+    game = TomGame(dirty_rects="--full-redraw" not in sys.argv, profiler=profiler)
+    while True:
+        clock.tick(10)
+        profiler.start()
+        game.handle_input(pygame.event.get())
+        profiler.mark('input')
+        game.update()
+        profiler.mark('update')
+        game.draw()
+        profiler.end(screen)
 
 
 # =========================
-# Restart Loop
+# Benchmark
 # =========================
-if __name__ == "__main__":
-    while True:
-        main()
-        screen.fill((0, 0, 0))
-        msg = FONT.render("Game Over! Press SPACE to restart.", True, (255, 255, 255))
-        screen.blit(msg, (200, 260))
-        pygame.display.flip()
+def turns(snake):
+    """Serpentine path: across a row, down one, back again."""
+    x, y = snake.head
+    if snake.direction[0] and (x + snake.direction[0]) in (-1, snake.grid_w):
+        return [[0, 1], [-snake.direction[0], 0]]
+    return []
+
+
+def bench_ticks(lengths=(100, 1000, 10000, 100000), ticks=20000):
+    """Cost of one move + self-collision check against snake length.
+
+    The snake snakes back and forth across a 1000x1000 grid so it never
+    crosses itself. The old list body is only timed up to 10k segments.
+    """
+    size = 1000
+    print("%10s %14s %14s" % ("length", "deque us/tick", "list us/tick"))
+    for length in lengths:
+        snake = Snake(size, size)
+        snake.length = length
+        for _ in range(length):
+            snake.buffer.extend(turns(snake))
+            snake.move()
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            snake.buffer.extend(turns(snake))
+            snake.move()
+            assert not snake.collide_self()
+        fast = (time.perf_counter() - start) / ticks * 1e6
+
+        slow = '-'
+        if length <= 10000:
+            body = [snake.unpack(cell) for cell in snake.body]
+            rounds = min(ticks, 200)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                body.insert(0, [(body[0][0] + 1) % size, body[0][1]])
+                body.pop()
+                body[0] in body[1:]
+            slow = "%.2f" % ((time.perf_counter() - start) / rounds * 1e6)
+        print("%10d %14.2f %14s" % (length, fast, slow))
+
+
+def bench_render(lengths=(50, 500, 2000), frames=300, seed=0):
+    """Frame time of full redraw against dirty rects as the snake grows."""
+    print("%10s %12s %12s" % ("length", "full ms", "dirty ms"))
+    for length in lengths:
+        timings = []
+        for dirty_rects in (False, True):
+            random.seed(seed)
+            snake = Snake()
+            snake.length = length
+            for _ in range(length):
+                snake.buffer.extend(turns(snake))
+                snake.move()
+            fruits = [Fruit(random.choice(["normal", "big", "slow", "speed"])) for _ in range(3)]
+            obstacles = [Obstacle() for _ in range(5)]
+            renderer = BoardRenderer(screen, dirty_rects)
+            renderer.draw(snake, fruits, obstacles, 0)
+            start = time.perf_counter()
+            for _ in range(frames):
+                snake.buffer.extend(turns(snake))
+                snake.move()
+                for obs in obstacles:
+                    obs.move()
+                renderer.draw(snake, fruits, obstacles, 0)
+            timings.append((time.perf_counter() - start) / frames * 1000)
+        print("%10d %12.3f %12.3f" % (length, timings[0], timings[1]))
+
+
+def bench_sprites(lengths=(50, 500, 2000), frames=100):
+    """Snake draw time, painting every segment against blitting sprites."""
+    print("%10s %12s %12s" % ("length", "paint ms", "sprites ms"))
+    for length in lengths:
+        snake = Snake()
+        snake.length = length
+        for _ in range(length):
+            snake.buffer.extend(turns(snake))
+            snake.move()
+        draw_snake(screen, snake, TILE)
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            for i, part in enumerate(snake.segments()):
+                paint_segment(screen, part[0] * TILE + TILE // 2, part[1] * TILE + TILE // 2,
+                              *segment_style(i, TILE))
+        paint = (time.perf_counter() - start) / frames * 1000
 
-        waiting = True
-        while waiting:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                    waiting = False
+        start = time.perf_counter()
+        for _ in range(frames):
+            draw_snake(screen, snake, TILE)
+        sprites = (time.perf_counter() - start) / frames * 1000
+        print("%10d %12.3f %12.3f" % (length, paint, sprites))
+
+
+# =========================
+# Entry Point
+# =========================
+if __name__ == "__main__" and "--bench" in sys.argv:
+    bench_ticks()
+    bench_render()
+    bench_sprites()
+elif __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Intraday bars for the yahoo notebook: session filter and local store.
+
+filter_market_hours keeps bars inside the 09:30-16:00 New York session
+on weekdays. It no longer converts the index to New York time to ask
+for the weekday and the time of day. Instead it looks the UTC
+timestamps up in a per-year calendar of session open and close times.
+
+BarStore keeps bars on disk, one raw NumPy column file per field under
+root/TICKER/interval/, so adding bars is an append and reading them back
+is a memory map. update_bars asks a source only for bars newer than
+the last one stored.
+
+    python bars.py            check against the old filter, with a fake source
+    python bars.py --bench    multi-year 1-minute history
+"""
+
+import datetime
+import functools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+EXCHANGE_TZ = "America/New_York"
+MARKET_OPEN = datetime.time(9, 30)
+MARKET_CLOSE = datetime.time(16, 0)
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+TIME_FILE = 'time.i8'
+
+# the longest history yahoo serves for each intraday interval
+MAX_PERIOD = {'1m': '7d', '2m': '60d', '5m': '60d', '15m': '60d', '30m': '60d',
+              '60m': '730d', '90m': '60d', '1h': '730d'}
+
+
+def utc_ns(index):
+    """A DatetimeIndex as int64 nanoseconds since the epoch, UTC (naive means UTC)."""
+    return index.as_unit('ns').asi8
+
+
+def interval_ns(interval):
+    """Length of a yahoo interval such as '5m' or '1h' in nanoseconds."""
+    unit = {'m': 'min', 'h': 'h', 'd': 'D'}[interval[-1]]
+    return pd.Timedelta(int(interval[:-1]), unit).value
+
+
+# ----------------- Market hours -----------------
+@functools.lru_cache(maxsize=None)
+def session_calendar(year):
+    """UTC ns (opens, closes) of every weekday session in `year`, sorted."""
+    days = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="B")
+    opens = days + pd.Timedelta(hours=MARKET_OPEN.hour, minutes=MARKET_OPEN.minute)
+    closes = days + pd.Timedelta(hours=MARKET_CLOSE.hour, minutes=MARKET_CLOSE.minute)
+    return (utc_ns(opens.tz_localize(EXCHANGE_TZ)), utc_ns(closes.tz_localize(EXCHANGE_TZ)))
+
+
+def sessions(first_year, last_year):
+    calendars = [session_calendar(year) for year in range(first_year, last_year + 1)]
+    return (np.concatenate([opens for opens, closes in calendars]),
+            np.concatenate([closes for opens, closes in calendars]))
+
+
+def market_hours_mask(times):
+    """True for each UTC ns timestamp inside a session, both ends included.
+
+    The timestamps may be in any order.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    if not len(times):
+        return np.zeros(0, bool)
+    first, last = np.array([times.min(), times.max()]).astype('datetime64[ns]').astype('datetime64[Y]').astype(int) + 1970
+    opens, closes = sessions(int(first), int(last))
+    i = np.searchsorted(opens, times, side='right') - 1
+    return (i >= 0) & (times <= closes[np.maximum(i, 0)])
+
+
+def filter_market_hours(df):
+    """Filter a datetime-indexed DataFrame to US market hours (index in ET)."""
+    return df[market_hours_mask(utc_ns(df.index))].tz_convert(EXCHANGE_TZ)
+
+
+def filter_market_hours_tz(df):
+    """The notebook's original filter, kept for the check and the benchmark."""
+    df = df.tz_convert(EXCHANGE_TZ)
+    df = df[df.index.dayofweek < 5]
+    return df.between_time(MARKET_OPEN, MARKET_CLOSE)
+
+
+# ----------------- Local store -----------------
+class BarStore(object):
+    """Append-only bars, one raw column file per field.
+
+    time.i8 holds UTC ns timestamps, strictly increasing; each field in
+    FIELDS is float64. Rows past the shortest column, left by an append
+    that did not finish, are ignored on read and cut off by the next one.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, ticker, interval, name=''):
+        return os.path.join(self.root, ticker, interval, name)
+
+    def count(self, ticker, interval):
+        sizes = []
+        for name, dtype in self.files():
+            path = self.path(ticker, interval, name)
+            sizes.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def files(self):
+        return [(TIME_FILE, np.int64)] + [(field + '.f8', np.float64) for field in FIELDS]
+
+    def columns(self, ticker, interval):
+        """Memory-mapped arrays: 'time' plus one per field."""
+        n = self.count(ticker, interval)
+        columns = {}
+        for name, dtype in self.files():
+            key = os.path.splitext(name)[0]
+            if n:
+                columns[key] = np.memmap(self.path(ticker, interval, name), dtype, 'r', shape=(n,))
+            else:
+                columns[key] = np.zeros(0, dtype)
+        return columns
+
+    def last_time(self, ticker, interval):
+        times = self.columns(ticker, interval)['time']
+        return int(times[-1]) if len(times) else None
+
+    def append(self, ticker, interval, df):
+        """Add bars from a DataFrame with a datetime index and FIELDS columns."""
+        if not len(df):
+            return
+        times = utc_ns(df.index)
+        last = self.last_time(ticker, interval)
+        if np.any(np.diff(times) <= 0) or (last is not None and times[0] <= last):
+            raise ValueError("bars must be newer than %s and strictly increasing" % last)
+        os.makedirs(self.path(ticker, interval), exist_ok=True)
+        n = self.count(ticker, interval)
+        for name, dtype in self.files():
+            key = os.path.splitext(name)[0]
+            values = times if key == 'time' else df[key].to_numpy(np.float64)
+            with open(self.path(ticker, interval, name), 'r+b' if n else 'wb') as f:
+                # drop what a crashed append left past the common length
+                f.truncate(n * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(values, dtype).tobytes())
+
+    def truncate(self, ticker, interval, n):
+        """Keep only the first `n` bars."""
+        # the time column first, so a crash part way leaves it the shortest
+        for name, dtype in self.files():
+            with open(self.path(ticker, interval, name), 'r+b') as f:
+                f.truncate(n * np.dtype(dtype).itemsize)
+
+    def load(self, ticker, interval):
+        """All stored bars as a DataFrame indexed by UTC time."""
+        columns = self.columns(ticker, interval)
+        index = pd.DatetimeIndex(np.asarray(columns.pop('time')).astype('datetime64[ns]'), tz='UTC')
+        return pd.DataFrame({field: np.asarray(columns[field]) for field in FIELDS}, index=index)
+
+
+# ----------------- Sources -----------------
+def normalize(df):
+    """yf.download output for one ticker as lower-case FIELDS columns."""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df.rename(columns=str.lower)
+    return df[list(FIELDS)]
+
+
+class YahooSource(object):
+    """Bars from yfinance; the first fetch takes the longest history allowed."""
+
+    def fetch(self, ticker, interval, since=None):
+        import yfinance as yf
+
+        if since is None:
+            df = yf.download(ticker, period=MAX_PERIOD.get(interval, 'max'), interval=interval,
+                             progress=False, auto_adjust=True)
+        else:
+            df = yf.download(ticker, start=pd.Timestamp(since, unit='ns', tz='UTC'), interval=interval,
+                             progress=False, auto_adjust=True)
+        return normalize(df)
+
+
+class FakeSource(object):
+    """Repeatable bars around the clock from `origin` up to `now`, for offline use.
+
+    Like yahoo, a fetch with `since` also returns the bar at `since`.
+    With `live`, the bar at `now` is still forming, as it is during market
+    hours: it has half its volume and closes at its open.
+    `rows_served` counts every bar handed out.
+    """
+
+    def __init__(self, origin, now, seed=0, live=False):
+        self.origin = pd.Timestamp(origin, tz='UTC').value
+        self.now = pd.Timestamp(now, tz='UTC').value
+        self.seed = seed
+        self.live = live
+        self.rows_served = 0
+
+    def fetch(self, ticker, interval, since=None):
+        step = interval_ns(interval)
+        first = 0 if since is None else max(0, -(-(since - self.origin) // step))
+        k = np.arange(first, (self.now - self.origin) // step + 1)
+        phase = self.seed + sum(map(ord, ticker))
+        close = 100 + 10 * np.sin(k / 977.0 + phase) + np.sin(k / 13.0)
+        df = pd.DataFrame({
+            'open': close - 0.1 * np.cos(k / 7.0),
+            'high': close + 0.5,
+            'low': close - 0.5,
+            'close': close,
+            'volume': (1000 + 100 * np.cos(k / 3.0 + phase)).round(),
+        }, index=pd.DatetimeIndex((self.origin + k * step).astype('datetime64[ns]'), tz='UTC'))
+        if self.live and len(df):
+            df.iloc[-1, df.columns.get_loc('close')] = df['open'].iloc[-1]
+            df.iloc[-1, df.columns.get_loc('volume')] = (df['volume'].iloc[-1] / 2).round()
+        self.rows_served += len(df)
+        return df
+
+
+def update_bars(store, source, ticker, interval):
+    """Fetch bars from the last one stored on and store them. Returns how many are new.
+
+    The last stored bar may have been saved while it was still forming,
+    so it is replaced by the refetched one when the source returns it.
+    Nothing is dropped until the fetch has come back with bars.
+    """
+    last = store.last_time(ticker, interval)
+    df = source.fetch(ticker, interval, since=last)
+    if last is None:
+        store.append(ticker, interval, df)
+        return len(df)
+    times = utc_ns(df.index)
+    keep = times >= last
+    df, times = df[keep], times[keep]
+    if not len(df):
+        return 0
+    if times[0] == last:
+        store.truncate(ticker, interval, store.count(ticker, interval) - 1)
+    store.append(ticker, interval, df)
+    return int((times > last).sum())
+
+
+# ----------------- Check and benchmark -----------------
+def check():
+    """Mask against the old filter over both DST switches, and incremental updates."""
+    source = FakeSource("2024-01-01", "2024-12-31 23:59")
+    for interval in ('1m', '5m', '1h'):
+        df = source.fetch("GDX", interval)
+        assert filter_market_hours(df).equals(filter_market_hours_tz(df)), interval
+    unsorted = pd.DataFrame({'close': [1.0, 2.0, 3.0]}, index=pd.DatetimeIndex(
+        ["2024-03-05 15:00", "2023-06-06 15:00", "2024-03-06 15:00"], tz='UTC'))
+    assert filter_market_hours(unsorted).equals(filter_market_hours_tz(unsorted))
+    assert len(filter_market_hours(unsorted)) == 3
+
+    root = tempfile.mkdtemp()
+    try:
+        store = BarStore(root)
+        source = FakeSource("2024-03-01", "2024-03-20", live=True)
+        assert update_bars(store, source, "GDX", "5m") == 19 * 288 + 1
+        assert update_bars(store, source, "GDX", "5m") == 0
+        source.now += pd.Timedelta(days=1).value
+        served = source.rows_served
+        assert update_bars(store, source, "GDX", "5m") == 288
+        assert source.rows_served - served == 289
+        # the bar that was forming at the first update is complete now
+        stored = store.load("GDX", "5m")
+        assert stored.equals(source.fetch("GDX", "5m"))
+        assert stored.iloc[:-1].equals(FakeSource(source.origin, source.now).fetch("GDX", "5m").iloc[:-1])
+
+        # a fetch that fails leaves the forming bar stored
+        class Down(object):
+            def fetch(self, ticker, interval, since=None):
+                raise OSError("source down")
+        count = store.count("GDX", "5m")
+        try:
+            update_bars(store, Down(), "GDX", "5m")
+            raise AssertionError("no error from the source")
+        except OSError:
+            pass
+        assert store.count("GDX", "5m") == count and store.load("GDX", "5m").equals(stored)
+    finally:
+        shutil.rmtree(root)
+    print("ok")
+
+
+def bench(years=3):
+    """Session filter and store round trip on `years` of 1-minute bars."""
+    source = FakeSource("2021-01-01", pd.Timestamp("2021-01-01") + pd.DateOffset(years=years))
+    df = source.fetch("GDX", "1m")
+    print("%d one-minute bars over %d years" % (len(df), years))
+
+    for name, fn in (("tz filter", filter_market_hours_tz), ("mask", filter_market_hours)):
+        start = time.perf_counter()
+        kept = fn(df)
+        print("%-12s %8.1f ms  %d bars kept" % (name, (time.perf_counter() - start) * 1000, len(kept)))
+
+    root = tempfile.mkdtemp()
+    try:
+        store = BarStore(root)
+        start = time.perf_counter()
+        store.append("GDX", "1m", df)
+        print("%-12s %8.1f ms" % ("append all", (time.perf_counter() - start) * 1000))
+        start = time.perf_counter()
+        store.load("GDX", "1m")
+        print("%-12s %8.1f ms" % ("load all", (time.perf_counter() - start) * 1000))
+
+        source.now += pd.Timedelta(days=1).value
+        start = time.perf_counter()
+        added = update_bars(store, source, "GDX", "1m")
+        print("%-12s %8.1f ms  %d new bars" % ("update 1 day", (time.perf_counter() - start) * 1000, added))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        bench()
+    else:
+        check()
@@ -0,0 +1,234 @@
+"""Streaming OHLC candles from (timestamp, price) ticks.
+
+CandleBuilder takes ticks in time order, one at a time with add() or
+as NumPy arrays with add_batch(), and hands back each bar once a tick
+from a later bar arrives. Only the open bar is kept. Bars are
+[start, start + bar) in UTC milliseconds, and NaN prices are skipped
+like pandas does, so the output matches
+
+    df.groupby(df.Date.dt.floor(bar)).agg({id: ['min', 'max', 'first', 'last']})
+
+(with bar='1D' that is the notebook's groupby on Date.dt.date).
+
+    python candles.py            check against pandas
+    python candles.py --bench    100M ticks
+"""
+
+import collections
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+Candle = collections.namedtuple('Candle', 'time open high low close')
+
+
+def bar_ms(bar):
+    """Bar length in ms from an int or a string like '1m', '15m', '4h' or '1D'."""
+    if isinstance(bar, str):
+        unit = {'m': 'min', 'h': 'h', 'D': 'D', 'd': 'D'}[bar[-1]]
+        return int(pd.Timedelta(int(bar[:-1]), unit).total_seconds() * 1000)
+    return int(bar)
+
+
+class CandleBuilder(object):
+
+    def __init__(self, bar='1D'):
+        self.bar = bar_ms(bar)
+        self.key = None
+        self.open = self.high = self.low = self.close = np.nan
+
+    def _start(self, key):
+        self.key = key
+        self.open = self.high = self.low = self.close = np.nan
+
+    def _take(self, price):
+        if price != price:  # NaN
+            return
+        if self.open != self.open:
+            self.open = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+
+    def current(self):
+        """The open bar so far, or None before the first tick."""
+        if self.key is None:
+            return None
+        return Candle(self.key * self.bar, self.open, self.high, self.low, self.close)
+
+    def add(self, timestamp, price):
+        """Add one tick. Returns the bar it closed, or None."""
+        key = int(timestamp) // self.bar
+        done = None
+        if key != self.key:
+            if self.key is not None:
+                if key < self.key:
+                    raise ValueError("tick at %d is before the open bar" % timestamp)
+                done = self.current()
+            self._start(key)
+        self._take(float(price))
+        return done
+
+    def add_batch(self, timestamps, prices):
+        """Add sorted tick arrays. Returns the closed bars as a Candle of arrays."""
+        keys = np.asarray(timestamps, dtype=np.int64) // self.bar
+        prices = np.asarray(prices, dtype=np.float64)
+        if not len(keys):
+            return self.empty()
+        if np.any(keys[1:] < keys[:-1]) or (self.key is not None and keys[0] < self.key):
+            raise ValueError("ticks must be in time order")
+
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        ends = np.append(starts[1:], len(keys))
+        high = np.fmax.reduceat(prices, starts)
+        low = np.fmin.reduceat(prices, starts)
+        valid = np.flatnonzero(prices == prices)
+        if len(valid) == len(prices):
+            opens = prices[starts]
+            closes = prices[ends - 1]
+        else:
+            # first and last non-NaN price in each group
+            first = np.searchsorted(valid, starts)
+            after = np.searchsorted(valid, ends)
+            padded = np.append(prices[valid], np.nan)
+            has_price = first < after
+            opens = np.where(has_price, padded[np.minimum(first, len(valid))], np.nan)
+            closes = np.where(has_price, padded[np.maximum(after - 1, 0)], np.nan)
+        group_keys = keys[starts]
+
+        previous = None
+        if group_keys[0] == self.key:
+            # the batch continues the open bar
+            if self.open == self.open:
+                opens[0] = self.open
+                if closes[0] != closes[0]:
+                    closes[0] = self.close
+            high[0] = np.fmax(high[0], self.high)
+            low[0] = np.fmin(low[0], self.low)
+        else:
+            previous = self.current()
+
+        self.key = int(group_keys[-1])
+        self.open, self.high, self.low, self.close = opens[-1], high[-1], low[-1], closes[-1]
+
+        closed = Candle(group_keys[:-1] * self.bar, opens[:-1], high[:-1], low[:-1], closes[:-1])
+        if previous is not None:
+            closed = Candle(*(np.insert(column, 0, v) for v, column in zip(previous, closed)))
+        return closed
+
+    def flush(self):
+        """Close the open bar and return it (None if there is none)."""
+        candle = self.current()
+        self.key = None
+        self.open = self.high = self.low = self.close = np.nan
+        return candle
+
+    def empty(self):
+        return Candle(np.zeros(0, np.int64), *(np.zeros(0) for _ in range(4)))
+
+
+def candle_frame(timestamps, prices, bar='1D'):
+    """All bars of a tick series as a DataFrame indexed by bar start."""
+    builder = CandleBuilder(bar)
+    closed = builder.add_batch(timestamps, prices)
+    last = builder.flush()
+    if last is not None:
+        closed = Candle(*(np.append(column, v) for column, v in zip(closed, last)))
+    index = pd.DatetimeIndex(closed.time.astype('datetime64[ms]'), name='Date')
+    return pd.DataFrame({'open': closed.open, 'high': closed.high,
+                         'low': closed.low, 'close': closed.close}, index=index)
+
+
+def pandas_candles(timestamps, prices, bar='1D'):
+    """The notebook's groupby-agg, for the check and the benchmark."""
+    df = pd.DataFrame({'TimeStamp': timestamps, 'price': prices})
+    df['Date'] = pd.to_datetime(df['TimeStamp'], unit='ms')
+    return df.groupby(df.Date.dt.floor(pd.Timedelta(bar_ms(bar), 'ms'))).agg(
+        {'price': ['min', 'max', 'first', 'last']})
+
+
+def random_ticks(n, seed=0, start=1700000000000, nan_rate=0.0):
+    rng = np.random.default_rng(seed)
+    timestamps = start + np.cumsum(rng.integers(0, 20000, n))
+    prices = 100 + np.cumsum(rng.standard_normal(n))
+    if nan_rate:
+        prices[rng.random(n) < nan_rate] = np.nan
+    return timestamps, prices
+
+
+def check():
+    """Same bars as pandas across bar sizes, with and without NaNs, fed in random pieces."""
+    rng = np.random.default_rng(1)
+    for nan_rate, bar in ((0.0, '1m'), (0.3, '1m'), (0.0, '5m'), (0.3, '1h'), (0.3, '1D')):
+        timestamps, prices = random_ticks(200000, nan_rate=nan_rate)
+        expected = pandas_candles(timestamps, prices, bar)['price']
+        builder = CandleBuilder(bar)
+        parts = []
+        cuts = np.sort(rng.integers(0, len(prices), 50))
+        for lo, hi in zip(np.append(0, cuts), np.append(cuts, len(prices))):
+            if rng.random() < 0.3:
+                for t, p in zip(timestamps[lo:hi], prices[lo:hi]):
+                    candle = builder.add(t, p)
+                    if candle is not None:
+                        parts.append(Candle(*([v] for v in candle)))
+            else:
+                parts.append(builder.add_batch(timestamps[lo:hi], prices[lo:hi]))
+        parts.append(Candle(*([v] for v in builder.flush())))
+        got = Candle(*(np.concatenate(column) for column in zip(*parts)))
+
+        assert np.array_equal(got.time, expected.index.values.astype('datetime64[ms]').astype(np.int64)), bar
+        for name, column in (('min', got.low), ('max', got.high), ('first', got.open), ('last', got.close)):
+            assert np.array_equal(column, expected[name].to_numpy(), equal_nan=True), (bar, name)
+
+    # the notebook's daily candles, grouped by calendar date
+    timestamps, prices = random_ticks(200000, nan_rate=0.3)
+    df = pd.DataFrame({'TimeStamp': timestamps, 'coin': prices})
+    df['Date'] = pd.to_datetime(df['TimeStamp'], unit='ms')
+    daily = df.groupby(df.Date.dt.date).agg({'coin': ['min', 'max', 'first', 'last']})['coin']
+    frame = candle_frame(timestamps, prices, '1D')
+    assert list(frame.index.date) == list(daily.index)
+    assert np.array_equal(frame.open, daily['first'], equal_nan=True)
+    assert np.array_equal(frame.close, daily['last'], equal_nan=True)
+    print("ok")
+
+
+def bench(ticks=100000000, batch=1000000, bar='1m', pandas_ticks=10000000):
+    """Ticks per second through add_batch, against pandas on a slice."""
+    builder = CandleBuilder(bar)
+    bars = 0
+    elapsed = 0.0
+    last = 1700000000000
+    for i in range(0, ticks, batch):
+        timestamps, prices = random_ticks(min(batch, ticks - i), seed=i, start=last)
+        last = int(timestamps[-1])
+        start = time.perf_counter()
+        bars += len(builder.add_batch(timestamps, prices).time)
+        elapsed += time.perf_counter() - start
+    print("%-10s %12d ticks %8.2f s %12.0f ticks/s  %d bars" % (
+        "builder", ticks, elapsed, ticks / elapsed, bars + 1))
+
+    timestamps, prices = random_ticks(pandas_ticks)
+    start = time.perf_counter()
+    pandas_candles(timestamps, prices, bar)
+    elapsed = time.perf_counter() - start
+    print("%-10s %12d ticks %8.2f s %12.0f ticks/s" % ("pandas", pandas_ticks, elapsed, pandas_ticks / elapsed))
+
+    builder = CandleBuilder(bar)
+    n = 1000000
+    timestamps, prices = random_ticks(n)
+    start = time.perf_counter()
+    for t, p in zip(timestamps.tolist(), prices.tolist()):
+        builder.add(t, p)
+    elapsed = time.perf_counter() - start
+    print("%-10s %12d ticks %8.2f s %12.0f ticks/s" % ("add()", n, elapsed, n / elapsed))
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        bench()
+    else:
+        check()
@@ -0,0 +1,392 @@
+"""Concurrent HTTP fetching for the market-data notebooks.
+
+Fetcher runs many GETs at once on a bounded thread pool. Connections are
+kept alive and reused per host, a token bucket caps the request rate,
+and successful responses are cached on disk for `ttl` seconds, so a
+second run inside the TTL makes no network calls at all. It only needs
+the standard library.
+
+    fetcher = Fetcher(cache_dir=".http_cache", ttl=3600, workers=8, rate=5)
+    charts = coingecko_market_charts(fetcher, ["dogecoin", "bitcoin"], days=30)
+
+    python fetch.py            check against a local stub server
+    python fetch.py --bench    serial against pooled, against the stub
+"""
+
+import collections
+import concurrent.futures
+import email.utils
+import hashlib
+import http.client
+import http.server
+import json
+import os
+import queue
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+USER_AGENT = "Mozilla/5.0 (market-data fetcher)"
+RETRY_STATUS = (429, 500, 502, 503, 504)
+MAX_WAIT = 60
+
+
+class Response(collections.namedtuple('Response', 'url status headers body cached')):
+
+    def text(self, encoding='utf-8'):
+        return self.body.decode(encoding, 'replace')
+
+    def json(self):
+        return json.loads(self.body)
+
+
+# ----------------- Building blocks -----------------
+class RateLimiter(object):
+    """Token bucket: `rate` requests a second on average, bursts of `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # take the token now and wait for it outside the lock
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class ConnectionPool(object):
+    """Idle keep-alive connections per (scheme, host, port)."""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.idle = collections.defaultdict(queue.LifoQueue)
+
+    def acquire(self, scheme, netloc):
+        try:
+            return self.idle[scheme, netloc].get_nowait()
+        except queue.Empty:
+            cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            return cls(netloc, timeout=self.timeout)
+
+    def release(self, scheme, netloc, conn):
+        self.idle[scheme, netloc].put(conn)
+
+    def close(self):
+        for idle in self.idle.values():
+            while not idle.empty():
+                idle.get_nowait().close()
+
+
+class DiskCache(object):
+    """Responses on disk, one file per URL: a JSON header line, then the body."""
+
+    def __init__(self, root, ttl):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, url):
+        return os.path.join(self.root, hashlib.sha256(url.encode()).hexdigest())
+
+    def get(self, url):
+        try:
+            with open(self.path(url), 'rb') as f:
+                meta = json.loads(f.readline())
+                if time.time() - meta['time'] >= self.ttl:
+                    return None
+                return Response(url, meta['status'], meta['headers'], f.read(), True)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, response):
+        meta = {'time': time.time(), 'status': response.status, 'headers': response.headers}
+        path = self.path(response.url)
+        tmp = "%s.%d.%d" % (path, os.getpid(), threading.get_ident())
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(meta).encode() + b'\n' + response.body)
+        os.replace(tmp, path)
+
+
+def retry_after(value, default):
+    """Seconds to wait for a Retry-After header, in seconds or as an HTTP date.
+
+    Falls back to `default` when the header is missing or unreadable, and
+    never waits longer than MAX_WAIT.
+    """
+    try:
+        wait = float(value)
+    except (TypeError, ValueError):
+        try:
+            wait = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            wait = default
+    return min(max(wait, 0), MAX_WAIT)
+
+
+# ----------------- Fetcher -----------------
+class Fetcher(object):
+
+    def __init__(self, cache_dir=None, ttl=3600, workers=8, rate=None, burst=1,
+                 timeout=30, retries=3, headers=None):
+        self.cache = DiskCache(cache_dir, ttl) if cache_dir else None
+        self.limiter = RateLimiter(rate, burst) if rate else None
+        self.pool = ConnectionPool(timeout)
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self.retries = retries
+        self.headers = dict({'User-Agent': USER_AGENT, 'Connection': 'keep-alive'}, **(headers or {}))
+        self.network_calls = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
+
+    def get(self, url, params=None):
+        """One GET, from the cache if it is fresh there."""
+        if params:
+            url += ('&' if '?' in url else '?') + urllib.parse.urlencode(params)
+        if self.cache is not None:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return cached
+        response = self._request(url)
+        if self.cache is not None and response.status == 200:
+            self.cache.put(response)
+        return response
+
+    def get_many(self, urls):
+        """GET every URL concurrently; responses come back in the same order."""
+        return list(self.executor.map(self.get, urls))
+
+    def _request(self, url):
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        delay = 0.5
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            conn = self.pool.acquire(parts.scheme, parts.netloc)
+            try:
+                with self.lock:
+                    self.network_calls += 1
+                conn.request('GET', target, headers=self.headers)
+                reply = conn.getresponse()
+                body = reply.read()
+            except (OSError, http.client.HTTPException):
+                # most often a kept-alive connection the server already closed,
+                # so the first retry goes straight away
+                conn.close()
+                if attempt == self.retries:
+                    raise
+                if attempt:
+                    time.sleep(delay)
+                    delay *= 2
+                continue
+            if reply.will_close:
+                conn.close()
+            else:
+                self.pool.release(parts.scheme, parts.netloc, conn)
+            if reply.status in RETRY_STATUS and attempt < self.retries:
+                time.sleep(retry_after(reply.getheader('Retry-After'), delay))
+                delay *= 2
+                continue
+            return Response(url, reply.status, dict(reply.getheaders()), body, False)
+
+
+# ----------------- Market data -----------------
+COINGECKO = "https://api.coingecko.com/api/v3"
+
+
+def coingecko_market_charts(fetcher, ids, vs_currency='usd', days=30, base=COINGECKO):
+    """cg.get_coin_market_chart_by_id for many ids at once: {id: json}.
+
+    Raises ValueError naming the first id that did not come back 200 OK.
+    """
+    query = urllib.parse.urlencode({'vs_currency': vs_currency, 'days': days})
+    urls = ["%s/coins/%s/market_chart?%s" % (base, urllib.parse.quote(i), query) for i in ids]
+    charts = {}
+    for i, response in zip(ids, fetcher.get_many(urls)):
+        if response.status != 200:
+            raise ValueError("market chart for %r: HTTP %d %s" % (i, response.status, response.text()[:200]))
+        charts[i] = response.json()
+    return charts
+
+
+# ----------------- Stub server, check and benchmark -----------------
+class StubServer(object):
+    """Local keep-alive HTTP server answering every GET with JSON after `latency`.
+
+    Paths containing 'missing' get a 404 and paths containing 'busy' a 429
+    with Retry-After as an HTTP date, like an unknown coin id and an
+    exhausted rate limit.
+
+    `requests` counts GETs and `ports` collects client ports, one per
+    connection, so tests can see both network calls and reuse.
+    """
+
+    def __init__(self, latency=0.05):
+        stub = self
+        self.requests = 0
+        self.ports = set()
+        self.lock = threading.Lock()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                    stub.ports.add(self.client_address[1])
+                time.sleep(latency)
+                status = 404 if 'missing' in self.path else 429 if 'busy' in self.path else 200
+                if status == 200:
+                    body = json.dumps({'path': self.path, 'prices': [[0, 1.0]]}).encode()
+                else:
+                    body = json.dumps({'error': self.responses[status][0]}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 429:
+                    self.send_header('Retry-After', email.utils.formatdate(time.time() + 1, usegmt=True))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def check():
+    """Concurrency, connection reuse, caching, TTL, errors and rate limit against the stub."""
+    stub = StubServer(latency=0.05)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        ids = ["coin%d" % i for i in range(40)]
+        with Fetcher(cache_dir, ttl=60, workers=8) as fetcher:
+            start = time.perf_counter()
+            charts = coingecko_market_charts(fetcher, ids, base=stub.url)
+            elapsed = time.perf_counter() - start
+        assert [charts[i]['path'].split('?')[0] for i in ids] == ["/coins/%s/market_chart" % i for i in ids]
+        assert stub.requests == 40 and elapsed < 40 * 0.05 / 2, elapsed
+        assert len(stub.ports) <= 8, stub.ports
+
+        # a repeat run inside the TTL stays off the network
+        with Fetcher(cache_dir, ttl=60, workers=8) as fetcher:
+            assert coingecko_market_charts(fetcher, ids, base=stub.url) == charts
+            assert fetcher.network_calls == 0 and stub.requests == 40
+
+        # and after it expires, goes back
+        with Fetcher(cache_dir, ttl=0, workers=8) as fetcher:
+            coingecko_market_charts(fetcher, ids[:5], base=stub.url)
+            assert fetcher.network_calls == 5 and stub.requests == 45
+
+        # errors name the id and never reach the cache
+        with Fetcher(cache_dir, ttl=60, workers=8, retries=1) as fetcher:
+            for bad in ('missing', 'busy'):
+                try:
+                    coingecko_market_charts(fetcher, ['coin1', bad, 'coin2'], base=stub.url)
+                    raise AssertionError("no error for %s" % bad)
+                except ValueError as e:
+                    assert repr(bad) in str(e), e
+            # one 404, and a 429 retried once; the good ids came from the cache
+            assert fetcher.network_calls == 3
+            try:
+                coingecko_market_charts(fetcher, ['missing'], base=stub.url)
+                raise AssertionError("a 404 was cached")
+            except ValueError:
+                pass
+            assert fetcher.network_calls == 4
+
+        # Retry-After in seconds or as a date, and never for too long
+        now = email.utils.formatdate(time.time(), usegmt=True)
+        assert retry_after('2', 0.5) == 2 and retry_after(None, 0.5) == 0.5
+        assert retry_after('soon', 0.5) == 0.5 and retry_after(now, 0.5) <= 1
+        assert retry_after('86400', 0.5) == retry_after('Fri, 01 Jan 2100 00:00:00 GMT', 0.5) == MAX_WAIT
+
+        # a refused connection is retried at once, then after 0.5 s
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        url = "http://127.0.0.1:%d/" % closed.getsockname()[1]
+        closed.close()
+        with Fetcher(workers=1, retries=2) as fetcher:
+            start = time.perf_counter()
+            try:
+                fetcher.get(url)
+                raise AssertionError("no error from a closed port")
+            except OSError:
+                pass
+            assert fetcher.network_calls == 3 and 0.5 <= time.perf_counter() - start < 1.5
+
+        # 10 requests at 20/s with a burst of 1 take at least 0.45 s
+        with Fetcher(workers=8, rate=20) as fetcher:
+            start = time.perf_counter()
+            fetcher.get_many(["%s/r%d" % (stub.url, i) for i in range(10)])
+            assert time.perf_counter() - start >= 0.45
+    finally:
+        stub.close()
+        shutil.rmtree(cache_dir)
+    print("ok")
+
+
+def bench(symbols=64, latency=0.05):
+    """Serial one-off requests (the notebooks' pattern) against the pooled fetcher."""
+    stub = StubServer(latency)
+    try:
+        urls = ["%s/coins/c%d/market_chart" % (stub.url, i) for i in range(symbols)]
+        start = time.perf_counter()
+        for url in urls:
+            parts = urllib.parse.urlsplit(url)
+            conn = http.client.HTTPConnection(parts.netloc)
+            conn.request('GET', parts.path)
+            conn.getresponse().read()
+            conn.close()
+        print("%-10s %8.2f s" % ("serial", time.perf_counter() - start))
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            for name in ("pooled", "cached"):
+                with Fetcher(cache_dir, workers=16) as fetcher:
+                    start = time.perf_counter()
+                    fetcher.get_many(urls)
+                    print("%-10s %8.2f s  %d network calls" % (
+                        name, time.perf_counter() - start, fetcher.network_calls))
+        finally:
+            shutil.rmtree(cache_dir)
+    finally:
+        stub.close()
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        bench()
+    else:
+        check()
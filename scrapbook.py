@@ -1,41 +1,805 @@
+import codecs
+import functools
+import heapq
+import itertools
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from collections import Counter, deque, namedtuple
+from operator import itemgetter
+
+import numpy as np
+
+CHUNK_SIZE = 1 << 20
+
+
+HYPHENS = '-\u2010\u2011'
+APOSTROPHES = "'\u2018\u2019"
+# str.lower maps capital sigma to 'ς' or 'σ' depending on the letters
+# around it, which a one-character table cannot do
+CAPITAL_SIGMA = '\u03a3'
+
+
+@functools.lru_cache(maxsize=None)
+def _case_table(casefold):
+    # cased letters all live in the first two Unicode planes
+    fold = str.casefold if casefold else str.lower
+    table = {}
+    for cp in range(0x20000):
+        c = chr(cp)
+        folded = fold(c)
+        if folded != c:
+            table[cp] = folded
+    if not casefold:
+        del table[ord(CAPITAL_SIGMA)]
+    return table
+
+
+class Normalizer(object):
+    """Strip punctuation and lower-case text with one str.translate call.
+
+    punctuation -- characters removed from the text
+    casefold    -- use Unicode case folding ("Straße" -> "strasse") rather than lower()
+    hyphens     -- 'keep', 'split' (into two words) or 'join' ("long-only" -> "longonly")
+    apostrophes -- 'keep', 'straight' (typographic quotes become "'"), 'split' or 'join'
+
+    All rules are merged into a single translation table, built on the
+    first call, so each document is copied once. The defaults give
+    exactly text.replace(...).lower() for every punctuation character.
+    """
+
+    HYPHEN_RULES = ('keep', 'split', 'join')
+    APOSTROPHE_RULES = ('keep', 'straight', 'split', 'join')
+
+    def __init__(self, punctuation='.!,?', casefold=False, hyphens='keep', apostrophes='keep'):
+        if hyphens not in self.HYPHEN_RULES:
+            raise ValueError("hyphens must be one of %s" % (self.HYPHEN_RULES,))
+        if apostrophes not in self.APOSTROPHE_RULES:
+            raise ValueError("apostrophes must be one of %s" % (self.APOSTROPHE_RULES,))
+        self.punctuation = punctuation
+        self.casefold = casefold
+        self.hyphens = hyphens
+        self.apostrophes = apostrophes
+        self._table = None
+
+    def __reduce__(self):
+        # ship the settings, not the table, to other processes
+        return (Normalizer, (self.punctuation, self.casefold, self.hyphens, self.apostrophes))
+
+    def _build_table(self):
+        table = dict(_case_table(self.casefold))
+        for chars, rule in ((HYPHENS, self.hyphens), (APOSTROPHES, self.apostrophes)):
+            for c in chars:
+                if rule == 'split':
+                    table[ord(c)] = ' '
+                elif rule == 'join':
+                    table[ord(c)] = None
+                elif rule == 'straight':
+                    table[ord(c)] = "'"
+        for c in self.punctuation:
+            table[ord(c)] = None
+        return table
+
+    def __call__(self, text):
+        if self._table is None:
+            self._table = self._build_table()
+        text = text.translate(self._table)
+        if not self.casefold and CAPITAL_SIGMA in text:
+            # everything else is lower case already, so this only places the sigmas
+            text = text.lower()
+        return text
+
+
+DEFAULT_NORMALIZER = Normalizer()
+
+
+def normalize(text):
+    return DEFAULT_NORMALIZER(text)
+
+
+def split_chunks(chunks):
+    """Split a stream of normalized text chunks into lists of words.
+
+    A word cut in half by a chunk boundary is held back and glued onto
+    the start of the next chunk, so the words come out the same as
+    splitting the concatenated text.
+    """
+    tail = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        words = (tail + chunk).split()
+        tail = '' if chunk[-1].isspace() or not words else words.pop()
+        yield words
+    if tail:
+        yield [tail]
+
+
+def ngram_lists(word_lists, n):
+    """Turn lists of words into lists of space-joined n-grams.
+
+    The last n-1 words of each list are carried into the next one, so
+    n-grams spanning a chunk boundary are not lost.
+    """
+    carry = []
+    for words in word_lists:
+        if carry:
+            words = carry + words
+        if len(words) >= n:
+            yield list(map(' '.join, zip(*(words[i:] for i in range(n)))))
+        carry = words[len(words) - n + 1:] if n > 1 else []
+
+
+def _count(word_lists):
+    counts = Counter()
+    for words in word_lists:
+        counts.update(words)
+    return dict(counts)
+
+
+def count_words(chunks, normalizer=None):
+    """Count words in one pass over an iterable of raw text chunks."""
+    normalizer = normalizer or DEFAULT_NORMALIZER
+    return _count(split_chunks(map(normalizer, chunks)))
+
+
+def count_ngrams(chunks, n=2, normalizer=None, sketch=None):
+    """Count n-grams in one pass over raw text chunks.
+
+    With a sketch (SpaceSaving or CountMinSketch) the n-grams are fed
+    into it and the sketch is returned instead of an exact dict.
+    """
+    normalizer = normalizer or DEFAULT_NORMALIZER
+    return _tally(ngram_lists(split_chunks(map(normalizer, chunks)), n), sketch)
+
+
+def _tally(gram_lists, sketch):
+    if sketch is None:
+        return _count(gram_lists)
+    for grams in gram_lists:
+        sketch.update(grams)
+    return sketch
+
+
+def _merge(counts, new, sign=1):
+    for word, n in new.items():
+        total = counts.get(word, 0) + sign * n
+        if total:
+            counts[word] = total
+        else:
+            del counts[word]
+
+
+def map_chunks(path, window=CHUNK_SIZE, encoding='utf-8'):
+    """Decode a file through a memory map, one bounded window at a time.
+
+    Pages are released once their window has been decoded, so the
+    resident size does not grow with the file. Multi-byte characters cut
+    by a window edge are completed by the incremental decoder.
+    """
+    # madvise needs page-aligned offsets
+    window = max(mmap.PAGESIZE, window - window % mmap.PAGESIZE)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if hasattr(m, 'madvise'):
+                m.madvise(mmap.MADV_SEQUENTIAL)
+            for start in range(0, size, window):
+                yield decoder.decode(m[start:start + window])
+                if hasattr(m, 'madvise'):
+                    m.madvise(mmap.MADV_DONTNEED, start, min(window, size - start))
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
 class TextAnalyzer(object):
 
-    def __init__(self, text):
-        # remove punctuation
-        clean_text = text.replace('.', '').replace('!', '').replace(',', '').replace('?', '')
-        # make text lowercase
-        lower_text = clean_text.lower()
-        self.fmtText = lower_text
-
-    def freqAll(self):
-        # split text into words
-        words = self.fmtText.split()
-        # Create dictionary
-        dict = {}
-        for word in words:
-            dict[word] = words.count(word)
-        print(dict)
+    def __init__(self, text, normalizer=None):
+        self.normalizer = normalizer or DEFAULT_NORMALIZER
+        self.fmtText = self.normalizer(text)
+
+    @property
+    def fmtText(self):
+        # appended chunks are only joined when the whole text is asked for
+        if self._pieces is None:
+            return None
+        if len(self._pieces) > 1:
+            self._pieces = ['\n'.join(self._pieces)]
+        return self._pieces[0]
+
+    @fmtText.setter
+    def fmtText(self, text):
+        # replacing the text throws away the cached frequency index
+        self._pieces = None if text is None else [text]
+        self._counts = None
+
+    @classmethod
+    def from_chunks(cls, chunks, normalizer=None):
+        """Analyze a stream of text chunks without keeping the text.
+
+        The stream is consumed straight away; only the counts are kept,
+        so `fmtText` is None for analyzers built this way.
+        """
+        ta = cls.__new__(cls)
+        ta.normalizer = normalizer or DEFAULT_NORMALIZER
+        ta._pieces = None
+        ta._counts = count_words(chunks, ta.normalizer)
+        return ta
+
+    @classmethod
+    def from_file(cls, path, window=CHUNK_SIZE, encoding='utf-8', normalizer=None):
+        """Analyze a file through a memory map in `window`-byte pieces."""
+        return cls.from_chunks(map_chunks(path, window, encoding), normalizer)
+
+    def _index(self):
+        # build the frequency index on first use and keep it
+        if self._counts is None:
+            self._counts = _count(piece.split() for piece in self._pieces)
+        return self._counts
+
+    def append(self, text):
+        """Add a chunk of text, counting only the new words.
+
+        If the index has been built the chunk's counts are merged into
+        it; otherwise the chunk is counted with the rest on first use.
+        """
+        text = self.normalizer(text)
+        if self._counts is not None:
+            _merge(self._counts, Counter(text.split()))
+        if self._pieces is not None:
+            self._pieces.append(text)
+
+    def update(self, texts):
+        for text in texts:
+            self.append(text)
+
+    def freqAll(self, show=False):
+        dict = self._index().copy()
+        if show:
+            print(dict)
         return dict
 
     def freqOf(self, word):
-        # get frequency map
-        dict = self.freqAll()
+        dict = self._index()
         if word in dict:
             return dict[word]
         else:
             return "No such word in the text."
 
-ta1 = TextAnalyzer("Accomplished financial professional with over 20 years of experience in credit trading, portfolio management, \n"
-                   "and risk management within global fixed income capital markets. Expertise spans buy- and sell-side roles, employing long/short, \n"
-                   "long-only, algorithmic, and discretionary strategies. Deep understanding of market macro- and micro-structure. \n"
-                   "Proven track record of building scalable, profitable businesses with an ownership mindset. Skilled in leading small teams \n"
-                   " of traders and analysts, fostering collaboration, and managing stakeholder relationships to drive success in fixed income trading environments.")
+    def freqOf_many(self, words):
+        dict = self._index()
+        return {word: dict.get(word, 0) for word in words}
+
+    def topK(self, k=10):
+        return heapq.nlargest(k, self._index().items(), key=itemgetter(1))
+
+    def freqVector(self, vocab):
+        return vocab.encode(self._index())
+
+    def freqNgrams(self, n=2, sketch=None):
+        """Exact n-gram counts, or feed them into `sketch` to bound memory."""
+        if self._pieces is None:
+            raise ValueError("n-grams need the text; use count_ngrams on the stream instead")
+        return _tally(ngram_lists((piece.split() for piece in self._pieces), n), sketch)
+
+
+class SlidingTextAnalyzer(TextAnalyzer):
+    """TextAnalyzer over only the last `window` appended chunks.
+
+    Each chunk keeps its own counts so that they can be taken back out
+    of the index when the chunk falls out of the window.
+    """
+
+    def __init__(self, window, text='', normalizer=None):
+        self.window = window
+        self.normalizer = normalizer or DEFAULT_NORMALIZER
+        self._pieces = deque()
+        self._chunk_counts = deque()
+        self._counts = {}
+        if text:
+            self.append(text)
+
+    @property
+    def fmtText(self):
+        return '\n'.join(self._pieces)
+
+    @fmtText.setter
+    def fmtText(self, text):
+        # replacing the text starts the window again, with it as one chunk
+        self._pieces = deque()
+        self._chunk_counts = deque()
+        self._counts = {}
+        if text:
+            self._push(text)
+
+    @classmethod
+    def from_chunks(cls, chunks, normalizer=None):
+        raise ValueError("a sliding window needs its chunks kept; append them instead")
+
+    def append(self, text):
+        self._push(self.normalizer(text))
+
+    def _push(self, text):
+        chunk = Counter(text.split())
+        _merge(self._counts, chunk)
+        self._pieces.append(text)
+        self._chunk_counts.append(chunk)
+        if len(self._pieces) > self.window:
+            self._pieces.popleft()
+            _merge(self._counts, self._chunk_counts.popleft(), -1)
+
+
+class Vocabulary(object):
+    """Interned mapping between words and dense integer ids.
+
+    Share one Vocabulary between documents so their FreqVectors line up.
+    """
+
+    def __init__(self, words=()):
+        self.ids = {}
+        self.words = []
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def add(self, word):
+        id = self.ids.get(word)
+        if id is None:
+            id = self.ids[word] = len(self.words)
+            self.words.append(sys.intern(word))
+        return id
+
+    def encode(self, counts):
+        """Turn a word -> count dict into a FreqVector over this vocabulary."""
+        ids = np.fromiter((self.add(word) for word in counts), np.int64, len(counts))
+        vector = np.zeros(len(self.words), np.int64)
+        vector[ids] = np.fromiter(counts.values(), np.int64, len(counts))
+        return FreqVector(self, vector)
+
+
+class FreqVector(object):
+    """Word counts stored as an int64 array indexed by vocabulary id.
+
+    Vectors over the same Vocabulary support +, -, == and the other
+    comparisons element-wise; a vector made before the vocabulary grew
+    is treated as zero for the newer words.
+    """
+
+    MAGIC = b'TAFV1'
+
+    def __init__(self, vocab, counts):
+        self.vocab = vocab
+        self.counts = counts
+
+    def _full(self):
+        if len(self.counts) < len(self.vocab):
+            self.counts = np.concatenate([self.counts, np.zeros(len(self.vocab) - len(self.counts), np.int64)])
+        return self.counts
+
+    def _operands(self, other):
+        if isinstance(other, FreqVector):
+            if other.vocab is not self.vocab:
+                raise ValueError("FreqVectors must share a Vocabulary")
+            return self._full(), other._full()
+        return self._full(), other
+
+    def __add__(self, other):
+        a, b = self._operands(other)
+        return FreqVector(self.vocab, a + b)
+
+    def __sub__(self, other):
+        a, b = self._operands(other)
+        return FreqVector(self.vocab, a - b)
+
+    def __eq__(self, other):
+        a, b = self._operands(other)
+        return a == b
+
+    def __ne__(self, other):
+        a, b = self._operands(other)
+        return a != b
+
+    def __lt__(self, other):
+        a, b = self._operands(other)
+        return a < b
+
+    def __le__(self, other):
+        a, b = self._operands(other)
+        return a <= b
+
+    def __gt__(self, other):
+        a, b = self._operands(other)
+        return a > b
+
+    def __ge__(self, other):
+        a, b = self._operands(other)
+        return a >= b
+
+    __hash__ = None
+
+    def __getitem__(self, word):
+        id = self.vocab.ids.get(word)
+        if id is None or id >= len(self.counts):
+            return 0
+        return int(self.counts[id])
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def to_dict(self):
+        nonzero = np.flatnonzero(self.counts)
+        words = self.vocab.words
+        return {words[i]: int(n) for i, n in zip(nonzero, self.counts[nonzero])}
+
+    def save(self, path):
+        """Write the non-zero counts and their words to a compact binary file.
+
+        Layout: magic, count dtype, number of entries, newline-joined UTF-8
+        words, then the counts in the narrowest integer type that fits.
+        """
+        nonzero = np.flatnonzero(self.counts)
+        counts = self.counts[nonzero]
+        dtype = np.min_scalar_type(0)
+        if len(counts):
+            dtype = np.result_type(np.min_scalar_type(counts.min()), np.min_scalar_type(counts.max()))
+        words = '\n'.join(self.vocab.words[i] for i in nonzero).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack('<2sQQ', dtype.str[1:].encode('ascii'), len(counts), len(words)))
+            f.write(words)
+            f.write(counts.astype(dtype.newbyteorder('<')).tobytes())
+
+    @classmethod
+    def load(cls, path, vocab=None):
+        """Read a vector written by save, adding its words to `vocab`."""
+        vocab = Vocabulary() if vocab is None else vocab
+        with open(path, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError("%s is not a FreqVector file" % path)
+            code, n, n_bytes = struct.unpack('<2sQQ', f.read(struct.calcsize('<2sQQ')))
+            words = f.read(n_bytes).decode('utf-8').split('\n') if n else []
+            counts = np.fromfile(f, np.dtype('<' + code.decode('ascii')), n)
+        return vocab.encode(dict(zip(words, counts.astype(np.int64).tolist())))
+
+
+class SpaceSaving(object):
+    """Approximate heavy hitters in at most `capacity` counters.
+
+    Metwally et al.'s Space-Saving: when the table is full the smallest
+    counter is handed to the new item. Any item seen more than
+    total / capacity times is guaranteed to be kept, and its count is
+    over-estimated by at most errors[item].
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        # (count, item) per counter; entries go stale as counts grow and
+        # are refreshed lazily when they reach the top
+        self._heap = []
+
+    def update(self, items):
+        counts, errors, heap = self.counts, self.errors, self._heap
+        for item in items:
+            count = counts.get(item)
+            if count is not None:
+                counts[item] = count + 1
+            elif len(counts) < self.capacity:
+                counts[item] = 1
+                errors[item] = 0
+                heapq.heappush(heap, (1, item))
+            else:
+                while True:
+                    low, victim = heap[0]
+                    if counts[victim] == low:
+                        break
+                    heapq.heapreplace(heap, (counts[victim], victim))
+                del counts[victim], errors[victim]
+                counts[item] = low + 1
+                errors[item] = low
+                heapq.heapreplace(heap, (low + 1, item))
+        self.total += len(items)
+
+    def estimate(self, item):
+        return self.counts.get(item, 0)
+
+    def most_common(self, k=10):
+        return heapq.nlargest(k, self.counts.items(), key=itemgetter(1))
+
+    def nbytes(self):
+        return sys.getsizeof(self.counts) + sys.getsizeof(self.errors) + sys.getsizeof(self._heap)
+
+
+class CountMinSketch(object):
+    """Count-Min Sketch with a heavy-hitter candidate list.
+
+    The table takes `memory` bytes split over `depth` rows of a power of
+    two width; estimates never undercount. The `top` items with the
+    highest estimates are tracked for most_common. Items are hashed with
+    hash(), so a sketch is only meaningful inside one process.
+    """
+
+    def __init__(self, memory=1 << 20, depth=4, top=100, seed=0):
+        bits = max(1, (memory // (depth * 8)).bit_length() - 1)
+        self.width = 1 << bits
+        self._shift = np.uint64(64 - bits)
+        self.table = np.zeros((depth, self.width), np.int64)
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(1, 1 << 63, depth, dtype=np.uint64) | np.uint64(1))[:, None]
+        self._b = rng.integers(0, 1 << 63, depth, dtype=np.uint64)[:, None]
+        self._rows = np.arange(depth)[:, None]
+        self.top = top
+        self.candidates = {}
+        self.total = 0
+
+    def _columns(self, items):
+        # multiply-shift hashing, one row per seed pair
+        h = np.fromiter(map(hash, items), np.int64, len(items)).view(np.uint64)
+        return ((self._a * h + self._b) >> self._shift).astype(np.intp)
+
+    def update(self, items):
+        if not items:
+            return
+        batch = Counter(items)
+        keys = list(batch)
+        cols = self._columns(keys)
+        weights = np.fromiter(batch.values(), np.int64, len(keys))
+        for row, col in zip(self.table, cols):
+            np.add.at(row, col, weights)
+        self.total += len(items)
+
+        estimates = self.table[self._rows, cols].min(axis=0)
+        candidates = self.candidates
+        candidates.update(zip(keys, estimates.tolist()))
+        if len(candidates) > 2 * self.top:
+            self.candidates = dict(heapq.nlargest(self.top, candidates.items(), key=itemgetter(1)))
+
+    def estimate(self, item):
+        return int(self.table[self._rows, self._columns([item])].min())
+
+    def most_common(self, k=10):
+        return heapq.nlargest(k, self.candidates.items(), key=itemgetter(1))
+
+    def nbytes(self):
+        return self.table.nbytes + sys.getsizeof(self.candidates)
+
+
+CorpusFrequencies = namedtuple('CorpusFrequencies', 'term_freq doc_freq doc_count documents')
+
+
+def _iter_documents(source):
+    # a directory means every regular file in it, in name order
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        with os.scandir(source) as entries:
+            paths = sorted(entry.path for entry in entries if entry.is_file())
+        return paths, True
+    return source, False
+
+
+def _shards(docs, size):
+    docs = iter(docs)
+    while True:
+        shard = list(itertools.islice(docs, size))
+        if not shard:
+            return
+        yield shard
+
+
+def _count_shard(task):
+    docs, from_files, normalizer, per_document = task
+    term_freq = Counter()
+    doc_freq = Counter()
+    documents = []
+    for doc in docs:
+        if from_files:
+            counts = TextAnalyzer.from_file(doc, normalizer=normalizer)._counts
+        else:
+            counts = count_words([doc], normalizer)
+        term_freq.update(counts)
+        doc_freq.update(counts.keys())
+        if per_document:
+            documents.append(counts)
+    return term_freq, doc_freq, len(docs), documents
+
+
+def analyze_corpus(source, processes=None, shard_size=256, normalizer=None, per_document=False):
+    """Count a whole corpus, sharded across a process pool.
+
+    source is a directory of text files or an iterable of strings.
+    Shards of `shard_size` documents are counted in worker processes and
+    merged in input order, so the result is identical to processes=1.
+    term_freq is the total count of each word, doc_freq the number of
+    documents it appears in, and documents the per-document counts when
+    per_document is true.
+    """
+    docs, from_files = _iter_documents(source)
+    normalizer = normalizer or DEFAULT_NORMALIZER
+    tasks = ((shard, from_files, normalizer, per_document) for shard in _shards(docs, shard_size))
+
+    term_freq = Counter()
+    doc_freq = Counter()
+    doc_count = 0
+    documents = [] if per_document else None
+    if processes == 1:
+        pool = None
+        results = map(_count_shard, tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_count_shard, tasks)
+    try:
+        for shard_terms, shard_docs, shard_count, shard_documents in results:
+            term_freq.update(shard_terms)
+            doc_freq.update(shard_docs)
+            doc_count += shard_count
+            if per_document:
+                documents.extend(shard_documents)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return CorpusFrequencies(dict(term_freq), dict(doc_freq), doc_count, documents)
+
+
+def _normalize_chained(text):
+    return text.replace('.', '').replace('!', '').replace(',', '').replace('?', '').lower()
+
+
+def _freq_all_quadratic(text):
+    words = _normalize_chained(text).split()
+    return {word: words.count(word) for word in words}
+
+
+def bench_freq(sizes=(1 << 10, 1 << 20, 1 << 24, 1 << 27, 1 << 30), quadratic_limit=1 << 16):
+    """Time streaming counts from 1 KB up to 1 GB of generated text.
+
+    The text is generated chunk by chunk, so memory stays flat; the old
+    words.count() approach is only timed on the small inputs.
+    """
+    words = SAMPLE.split()
+    vocab = [w + str(i) for i in range(1000) for w in words[:20]]
+    block = ' '.join(vocab[(i * 7919) % len(vocab)] for i in range(20000)) + '\n'
+    normalize('')
+    print("%12s %10s %12s %12s" % ("bytes", "seconds", "MB/s", "quadratic"))
+    for size in sizes:
+        def chunks():
+            left = size
+            while left > 0:
+                yield block[:left]
+                left -= len(block)
+        start = time.perf_counter()
+        counts = count_words(chunks())
+        elapsed = time.perf_counter() - start
+        quadratic = '-'
+        if size <= quadratic_limit:
+            text = ''.join(chunks())
+            start = time.perf_counter()
+            assert _freq_all_quadratic(text) == counts
+            quadratic = "%.4f" % (time.perf_counter() - start)
+        print("%12d %10.4f %12.1f %12s" % (size, elapsed, size / elapsed / 1e6, quadratic))
+
+
+def bench_normalize(sizes=(1 << 20, 1 << 24, 1 << 27), repeat=3):
+    """Compare the chained str.replace/lower against Normalizer."""
+    normalizer = Normalizer()
+    assert normalizer(UNICODE_SAMPLE) == _normalize_chained(UNICODE_SAMPLE)
+    print("%12s %10s %12s %8s" % ("bytes", "chained", "translate", "speedup"))
+    for size in sizes:
+        text = (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+        assert normalizer(text) == _normalize_chained(text)
+        timings = []
+        for fn in (_normalize_chained, normalizer):
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn(text)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best)
+        print("%12d %10.4f %12.4f %7.1fx" % (size, timings[0], timings[1], timings[0] / timings[1]))
+
+
+def bench_corpus(n_docs=20000, doc_words=500, processes=(1, 2, 4, 8)):
+    """Time analyze_corpus with growing pool sizes on generated documents."""
+    words = [w + str(i) for i in range(200) for w in SAMPLE.split()[:50]]
+    docs = [' '.join(words[(d * 31 + i * 7919) % len(words)] for i in range(doc_words)) for d in range(n_docs)]
+    baseline = None
+    print("%10s %10s %10s" % ("processes", "seconds", "speedup"))
+    for n in processes:
+        start = time.perf_counter()
+        result = analyze_corpus(docs, processes=n)
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline, expected = elapsed, result
+        assert result == expected
+        print("%10d %10.3f %9.1fx" % (n, elapsed, baseline / elapsed))
+
+
+def bench_mmap(sizes=(1 << 24, 1 << 27, 1 << 30)):
+    """Report peak RSS of TextAnalyzer.from_file for growing files.
+
+    Each size runs in a fresh interpreter so ru_maxrss is its own peak.
+    """
+    import subprocess
+    import tempfile
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = ("import resource, scrapbook, sys; scrapbook.TextAnalyzer.from_file(sys.argv[1]); "
+            "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+    block = (SAMPLE + '\n') * 1000
+    print("%12s %10s %14s" % ("bytes", "seconds", "peak RSS (KB)"))
+    for size in sizes:
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            written = 0
+            while written < size:
+                written += f.write(block)
+        try:
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', code, f.name], cwd=here,
+                                 capture_output=True, text=True, check=True).stdout
+            print("%12d %10.2f %14s" % (written, time.perf_counter() - start, out.strip()))
+        finally:
+            os.remove(f.name)
+
+
+def bench_ngrams(n_words=2000000, n=2, k=100, memory=1 << 20):
+    """Compare exact n-gram counting with SpaceSaving and CountMinSketch.
 
-print(ta1.freqOf("barbarous"))
+    Reports throughput, memory, recall of the true top-k and the mean
+    relative error of the estimated top-k counts on Zipf-like text.
+    """
+    import random
+    rng = random.Random(0)
+    vocab = ['w%d' % i for i in range(50000)]
+    weights = [1.0 / (i + 1) for i in range(len(vocab))]
+    text = ' '.join(rng.choices(vocab, weights, k=n_words))
+    chunks = [text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)]
 
+    start = time.perf_counter()
+    exact = count_ngrams(chunks, n)
+    elapsed = time.perf_counter() - start
+    truth = heapq.nlargest(k, exact.items(), key=itemgetter(1))
+    print("%-14s %10s %12s %12s %8s %10s" % ("method", "seconds", "ngrams/s", "bytes", "recall", "rel.err"))
+    print("%-14s %10.2f %12.0f %12d %8.3f %10.4f" % ("exact", elapsed, n_words / elapsed, sys.getsizeof(exact), 1, 0))
 
+    for name, sketch in (("space-saving", SpaceSaving(memory // 200)),
+                         ("count-min", CountMinSketch(memory, top=k))):
+        start = time.perf_counter()
+        count_ngrams(chunks, n, sketch=sketch)
+        elapsed = time.perf_counter() - start
+        found = set(item for item, _ in sketch.most_common(k))
+        recall = sum(1 for item, _ in truth if item in found) / len(truth)
+        error = sum(abs(sketch.estimate(item) - count) / count for item, count in truth) / len(truth)
+        print("%-14s %10.2f %12.0f %12d %8.3f %10.4f" % (name, elapsed, n_words / elapsed, sketch.nbytes(), recall, error))
 
 
+SAMPLE = ("Accomplished financial professional with over 20 years of experience in credit trading, portfolio management, \n"
+          "and risk management within global fixed income capital markets. Expertise spans buy- and sell-side roles, employing long/short, \n"
+          "long-only, algorithmic, and discretionary strategies. Deep understanding of market macro- and micro-structure. \n"
+          "Proven track record of building scalable, profitable businesses with an ownership mindset. Skilled in leading small teams \n"
+          " of traders and analysts, fostering collaboration, and managing stakeholder relationships to drive success in fixed income trading environments.")
+UNICODE_SAMPLE = ("Don\u2019t \u2018Straße\u2019 \u2014 ΣΟΦΟΣ, ΟΔΥΣΣΕΥΣ! Σ ΣΑ. İstanbul-\u2011Ⅻ "
+                  "ǅemal ß ﬁnance \u2018quoted\u2019?")
 
+BENCHMARKS = {'freq': bench_freq, 'normalize': bench_normalize, 'corpus': bench_corpus, 'mmap': bench_mmap,
+              'ngrams': bench_ngrams}
 
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        names = sys.argv[sys.argv.index("--bench") + 1:] or list(BENCHMARKS)
+        for name in names:
+            BENCHMARKS[name]()
+    else:
+        ta1 = TextAnalyzer(SAMPLE)
 
+        print(ta1.freqOf("barbarous"))